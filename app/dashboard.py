@@ -2,28 +2,40 @@ import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.express as px
-import pandas as pd
-
-# Load the combined data from multiple CSV files
-fpt_data = pd.read_csv('data//merged_FPT_data.csv')
-hpg_data = pd.read_csv('data//merged_HPG_data.csv')
-vcb_data = pd.read_csv('data//merged_VCB_data.csv')
-vic_data = pd.read_csv('data//merged_VIC_data.csv')
-vnm_data = pd.read_csv('data//merged_VNM_data.csv')
-
-# Add a Symbol column to each dataframe
-fpt_data['Symbol'] = 'FPT'
-hpg_data['Symbol'] = 'HPG'
-vcb_data['Symbol'] = 'VCB'
-vic_data['Symbol'] = 'VIC'
-vnm_data['Symbol'] = 'VNM'
-
-# Combine the data
-combined_data = pd.concat([fpt_data, hpg_data, vcb_data, vic_data, vnm_data], ignore_index=True)
-
-# Ensure 'Date' is in the correct datetime format for the charts to display correctly
-combined_data['Unnamed: 0'] = pd.to_datetime(combined_data['Unnamed: 0'])
-combined_data = combined_data.rename(columns={'Unnamed: 0': 'Date'})
+import os
+import sys
+from functools import lru_cache
+
+# Allow importing the shared modules from the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import panel  # noqa: E402
+import storage  # noqa: E402
+from dashboard_cache import INDEX_CLOSE_COLUMNS as index_close_columns, DashboardCache  # noqa: E402
+from downsampling import downsample, downsample_long  # noqa: E402
+
+symbols = ['FPT', 'HPG', 'VCB', 'VIC', 'VNM']
+
+# Number of symbols whose rendered figures are kept in memory
+FIGURE_CACHE_SIZE = 32
+
+# The float32 panel written by pre_processing holds every symbol once; it is loaded on first use
+@lru_cache(maxsize=1)
+def load_panel():
+    return panel.Panel.load()
+
+# Load only the columns used by the charts, from the panel when available and otherwise from the
+# per-symbol merged file; both return a parsed 'Date' index
+def load_symbol_data(symbol):
+    columns = [f'{symbol}_volume', f'{symbol}_close'] + index_close_columns + ['sentiment_score']
+    if panel.exists():
+        data = load_panel().to_wide(symbol, columns).reset_index()
+    else:
+        data = storage.read_frame(f'data//merged_{symbol}_data', columns=columns).reset_index()
+    data['Symbol'] = symbol
+    return data
+
+# Per-symbol partitions are loaded on first use and kept with their aggregates
+cache = DashboardCache(symbols, load_symbol_data)
 
 # Create the Dash application
 app = dash.Dash(__name__)
@@ -34,10 +46,12 @@ app.layout = html.Div(children=[
     html.Div(children='Lựa chọn mã cổ phiếu:'),
     dcc.Dropdown(
         id='stock-symbol-dropdown',
-        options=[{'label': symbol, 'value': symbol} for symbol in combined_data['Symbol'].unique()],
-        value=combined_data['Symbol'].unique()[0],
+        options=[{'label': symbol, 'value': symbol} for symbol in cache.symbols],
+        value=cache.symbols[0],
         multi=False
     ),
+    html.Div(children='Khoảng thời gian hiển thị:'),
+    dcc.DatePickerRange(id='date-range', display_format='YYYY-MM-DD', clearable=True),
     html.Div(children='Biểu đồ khối lượng giao dịch theo thời gian.'),
     dcc.Graph(id='volume-time-series'),
     html.Div(children='Biểu đồ giá đóng cửa theo thời gian.'),
@@ -58,96 +72,66 @@ app.layout = html.Div(children=[
     dcc.Graph(id='correlation-indexes-sentiment')
 ])
 
-# Callbacks for updating the graphs
+# Build all figures for a symbol and date window (None = unbounded) from its partition and
+# memoized aggregates. Line traces are downsampled server-side to a bounded number of points:
+# min-max for volume so spikes survive, LTTB for prices
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def build_figures(selected_symbol, start_date=None, end_date=None):
+    filtered_data = cache.window(selected_symbol, start_date, end_date)
+    scatter_data = cache.scatter_sample(selected_symbol, start_date, end_date)
+    close_col = f'{selected_symbol}_close'
+
+    volume_fig = px.line(downsample(filtered_data, 'Date', f'{selected_symbol}_volume', method='minmax'), x='Date',
+                         y=f'{selected_symbol}_volume', title=f'Khối Lượng Giao Dịch Của {selected_symbol} Theo Thời Gian')
+    close_fig = px.line(downsample(filtered_data, 'Date', close_col), x='Date', y=close_col,
+                        title=f'Giá Đóng Cửa Của {selected_symbol} Theo Thời Gian')
+    correlation_fig = px.imshow(cache.correlation(selected_symbol, [close_col, 'sentiment_score'], start_date, end_date), text_auto=True,
+                                title=f'Tương Quan Giữa Giá và Điểm Số Cảm Xúc Của {selected_symbol}')
+    indexes_fig = px.line(downsample_long(filtered_data, 'Date', index_close_columns), x='Date', y='value', color='variable',
+                          title=f'Các Chỉ Số Chứng Khoán Theo Thời Gian')
+    scatter_price_sentiment_fig = px.scatter(scatter_data, x='sentiment_score', y=close_col, color=close_col,
+                                             color_continuous_scale=px.colors.sequential.Viridis,
+                                             title=f'Biểu Đồ Phân Tán Giữa Giá Đóng Cửa và Điểm Số Cảm Xúc Của {selected_symbol}')
+    scatter_indexes_price_fig = px.scatter_matrix(scatter_data, dimensions=index_close_columns + [close_col],
+                                                  title=f'Biểu Đồ Phân Tán Giữa Các Chỉ Số Chứng Khoán và Giá Đóng Cửa Của {selected_symbol}')
+    scatter_indexes_sentiment_fig = px.scatter_matrix(scatter_data, dimensions=index_close_columns + ['sentiment_score'],
+                                                      title=f'Biểu Đồ Phân Tán Giữa Các Chỉ Số Chứng Khoán và Điểm Số Cảm Xúc Của {selected_symbol}')
+    correlation_indexes_price_fig = px.imshow(cache.correlation(selected_symbol, index_close_columns + [close_col], start_date, end_date), text_auto=True,
+                                              title=f'Tương Quan Giữa Các Chỉ Số Chứng Khoán và Giá Đóng Cửa Của {selected_symbol}')
+    correlation_indexes_sentiment_fig = px.imshow(cache.correlation(selected_symbol, index_close_columns + ['sentiment_score'], start_date, end_date), text_auto=True,
+                                                  title=f'Tương Quan Giữa Các Chỉ Số Chứng Khoán và Điểm Số Cảm Xúc Của {selected_symbol}')
+
+    return (volume_fig, close_fig, correlation_fig, indexes_fig, scatter_price_sentiment_fig,
+            scatter_indexes_price_fig, scatter_indexes_sentiment_fig, correlation_indexes_price_fig,
+            correlation_indexes_sentiment_fig)
+
+# One callback updates every graph from the same partition; figures are cached per symbol
 @app.callback(
     Output('volume-time-series', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_volume_graph(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.line(filtered_data, x='Date', y=f'{selected_symbol}_volume', title=f'Khối Lượng Giao Dịch Của {selected_symbol} Theo Thời Gian')
-    return fig
-
-@app.callback(
     Output('close-price-time-series', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_close_price_graph(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.line(filtered_data, x='Date', y=f'{selected_symbol}_close', title=f'Giá Đóng Cửa Của {selected_symbol} Theo Thời Gian')
-    return fig
-
-@app.callback(
     Output('correlation-heatmap', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_correlation_heatmap(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    correlation = filtered_data[[f'{selected_symbol}_close', 'sentiment_score']].corr()
-    fig = px.imshow(correlation, text_auto=True, title=f'Tương Quan Giữa Giá và Điểm Số Cảm Xúc Của {selected_symbol}')
-    return fig
-
-@app.callback(
     Output('stock-indexes', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_stock_indexes(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.line(filtered_data, x='Date', 
-                  y=['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close'], 
-                  title=f'Các Chỉ Số Chứng Khoán Theo Thời Gian')
-    return fig
-
-@app.callback(
     Output('scatter-price-sentiment', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_scatter_price_sentiment(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.scatter(filtered_data, x='sentiment_score', y=f'{selected_symbol}_close', color=f'{selected_symbol}_close', 
-                     color_continuous_scale=px.colors.sequential.Viridis,
-                     title=f'Biểu Đồ Phân Tán Giữa Giá Đóng Cửa và Điểm Số Cảm Xúc Của {selected_symbol}')
-    return fig
-
-@app.callback(
     Output('scatter-indexes-price', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_scatter_indexes_price(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.scatter_matrix(filtered_data, dimensions=['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close', f'{selected_symbol}_close'],
-                            title=f'Biểu Đồ Phân Tán Giữa Các Chỉ Số Chứng Khoán và Giá Đóng Cửa Của {selected_symbol}')
-    return fig
-
-@app.callback(
     Output('scatter-indexes-sentiment', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
-)
-def update_scatter_indexes_sentiment(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    fig = px.scatter_matrix(filtered_data, dimensions=['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close', 'sentiment_score'],
-                            title=f'Biểu Đồ Phân Tán Giữa Các Chỉ Số Chứng Khoán và Điểm Số Cảm Xúc Của {selected_symbol}')
-    return fig
-
-@app.callback(
     Output('correlation-indexes-price', 'figure'),
-    Input('stock-symbol-dropdown', 'value')
+    Output('correlation-indexes-sentiment', 'figure'),
+    Input('stock-symbol-dropdown', 'value'),
+    Input('date-range', 'start_date'),
+    Input('date-range', 'end_date')
 )
-def update_correlation_indexes_price(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    correlation = filtered_data[['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close', f'{selected_symbol}_close']].corr()
-    fig = px.imshow(correlation, text_auto=True, title=f'Tương Quan Giữa Các Chỉ Số Chứng Khoán và Giá Đóng Cửa Của {selected_symbol}')
-    return fig
+def update_graphs(selected_symbol, start_date=None, end_date=None):
+    return build_figures(selected_symbol, start_date, end_date)
 
+# Limit the date picker to the selected symbol's history
 @app.callback(
-    Output('correlation-indexes-sentiment', 'figure'),
+    Output('date-range', 'min_date_allowed'),
+    Output('date-range', 'max_date_allowed'),
     Input('stock-symbol-dropdown', 'value')
 )
-def update_correlation_indexes_sentiment(selected_symbol):
-    filtered_data = combined_data[combined_data['Symbol'] == selected_symbol]
-    correlation = filtered_data[['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close', 'sentiment_score']].corr()
-    fig = px.imshow(correlation, text_auto=True, title=f'Tương Quan Giữa Các Chỉ Số Chứng Khoán và Điểm Số Cảm Xúc Của {selected_symbol}')
-    return fig
+def update_date_bounds(selected_symbol):
+    dates = cache.partition(selected_symbol)['Date']
+    return dates.iloc[0].date(), dates.iloc[-1].date()
 
 # Run the app
 if __name__ == '__main__':
@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+INDEX_CLOSE_COLUMNS = ['Dollar_Index_Close', 'Dow_Jones_Close', 'Nasdaq_Close', 'US_30_Close', 'US_500_Close']
+
+# Upper bound on the number of rows plotted in the scatter matrices
+MAX_SCATTER_POINTS = 2000
+# Number of memoized aggregates (per symbol and date window) kept in memory
+MEMO_SIZE = 256
+
+
+class DashboardCache:
+    """Per-symbol partitions and derived aggregates for the dashboard.
+
+    Each symbol's frame is loaded once (lazily, through `loader`) and kept as its own
+    partition, so callbacks never scan a combined frame. Correlation matrices and
+    scatter samples are memoized per symbol and date window (start/end, None = unbounded).
+    """
+
+    def __init__(self, symbols, loader):
+        self.symbols = list(symbols)
+        self.loader = loader
+        self._partitions = {}
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frames(cls, frames):
+        cache = cls(frames.keys(), frames.__getitem__)
+        cache._partitions.update(frames)
+        return cache
+
+    def partition(self, symbol):
+        if symbol not in self._partitions:
+            data = self.loader(symbol)
+            with self._lock:
+                self._partitions.setdefault(symbol, data)
+        return self._partitions[symbol]
+
+    def memoize(self, key, compute):
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        value = compute()
+        with self._lock:
+            self._memo[key] = value
+            if len(self._memo) > MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return value
+
+    # Rows of a symbol inside [start, end], found by binary search on the sorted dates
+    def window(self, symbol, start=None, end=None):
+        data = self.partition(symbol)
+        dates = data['Date'].to_numpy()
+        lo = 0 if start is None else np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side='left')
+        hi = len(data) if end is None else np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side='right')
+        return data.iloc[lo:hi]
+
+    def correlation(self, symbol, columns, start=None, end=None):
+        columns = tuple(columns)
+        return self.memoize(('corr', symbol, columns, start, end),
+                            lambda: self.window(symbol, start, end)[list(columns)].corr())
+
+    # Evenly spaced rows, so scatter matrices stay bounded regardless of history length
+    def scatter_sample(self, symbol, start=None, end=None, max_points=MAX_SCATTER_POINTS):
+        def compute():
+            data = self.window(symbol, start, end)
+            if len(data) <= max_points:
+                return data
+            return data.iloc[np.linspace(0, len(data) - 1, max_points).astype(int)]
+        return self.memoize(('scatter', symbol, start, end, max_points), compute)
+
+    def clear(self):
+        with self._lock:
+            self._partitions.clear()
+            self._memo.clear()
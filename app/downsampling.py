@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+# Upper bound on the number of points sent to the browser for each line trace
+MAX_POINTS_PER_TRACE = 1000
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, max_points):
+    """Row positions kept by Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last points, and from each bucket in between the point forming
+    the largest triangle with the previously kept point and the next bucket's average,
+    which preserves the visual shape of the series.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=float)
+
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    kept = np.empty(max_points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    # Averages of every bucket are independent of the selection, so compute them up front
+    bucket_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    bucket_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / np.diff(edges)
+    next_x = np.append(bucket_x[1:], x[-1])
+    next_y = np.append(bucket_y[1:], y[-1])
+
+    prev = 0
+    for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        area = np.abs((x[prev] - next_x[i]) * (y[start:end] - y[prev])
+                      - (x[prev] - x[start:end]) * (next_y[i] - y[prev]))
+        prev = start + int(np.argmax(area))
+        kept[i + 1] = prev
+    return kept
+
+
+# Keeps the minimum and maximum of each bucket, so spikes (e.g. volume) are never dropped
+def minmax_indices(y, max_points):
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+    buckets = np.arange(n) * (max_points // 2) // n
+    order = np.lexsort((np.asarray(y, dtype=float), buckets))
+    starts = np.searchsorted(buckets[order], np.arange(max_points // 2))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample(data, x, y, max_points=MAX_POINTS_PER_TRACE, method='lttb'):
+    """Rows of `data` to plot for column `y` against `x`, at most `max_points` of them."""
+    data = data.dropna(subset=[y])
+    if method == 'minmax':
+        rows = minmax_indices(data[y].to_numpy(), max_points)
+    else:
+        rows = lttb_indices(data[x].to_numpy(), data[y].to_numpy(), max_points)
+    return data.iloc[rows]
+
+
+# Long-format frame (x, 'variable', 'value') with each column downsampled on its own,
+# for line charts with several traces
+def downsample_long(data, x, columns, max_points=MAX_POINTS_PER_TRACE, method='lttb'):
+    frames = []
+    for column in columns:
+        sampled = downsample(data, x, column, max_points, method)
+        frames.append(pd.DataFrame({x: sampled[x].to_numpy(), 'variable': column, 'value': sampled[column].to_numpy()}))
+    return pd.concat(frames, ignore_index=True)
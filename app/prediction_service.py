@@ -0,0 +1,256 @@
+import argparse
+import os
+import sys
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+# Cho phép import các module dùng chung ở thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import feature_store  # noqa: E402
+import forecasting  # noqa: E402
+import instrumentation  # noqa: E402
+import model_bundle  # noqa: E402
+import storage  # noqa: E402
+
+# Đường dẫn tính theo vị trí file để không phụ thuộc thư mục chạy Streamlit
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+STATE_PATH = os.path.join(BASE_DIR, feature_store.STATE_PATH)
+
+# Số mô hình / ma trận đặc trưng được giữ sẵn trong bộ nhớ tiến trình
+CACHE_SIZE = 16
+
+
+# Tên file mô hình: '<tên mô hình>_<mã cổ phiếu>_tuned.joblib'
+def model_file(model_name, symbol):
+    return f'{model_name}_{symbol}_tuned.joblib'
+
+
+def model_path(model_name):
+    return os.path.join(MODEL_DIR, model_name)
+
+
+def data_path(symbol):
+    return os.path.join(DATA_DIR, f'merged_{symbol}_data')
+
+
+def history_path(symbol):
+    return os.path.join(DATA_DIR, f'{symbol}_history')
+
+
+# Các hàm có hậu tố _cached nhận mtime trong khóa cache: khi file thay đổi,
+# khóa mới được tạo và bản cũ sẽ bị loại khỏi LRU
+@lru_cache(maxsize=4)
+def _list_model_files_cached(model_dir, dir_mtime):
+    return tuple(sorted(f for f in os.listdir(model_dir) if f.endswith('.joblib')))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _load_features_cached(path, file_mtime):
+    return storage.read_frame(path)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _load_model_cached(path, file_mtime, features_path, features_mtime, target_column):
+    bundle = model_bundle.load_bundle(path, mmap=True)
+    if model_bundle.is_legacy(bundle):
+        # Mô hình định dạng cũ không lưu scaler: fit scaler trên toàn bộ dữ liệu như trước đây
+        X = _load_features_cached(features_path, features_mtime).drop(columns=[target_column])
+        # Dữ liệu đã thêm cột (ví dụ các cột cảm xúc) sau khi mô hình được huấn luyện thì không dùng được nữa
+        n_features = getattr(bundle['estimator'], 'n_features_in_', X.shape[1])
+        if n_features != X.shape[1]:
+            raise ValueError(f"Mô hình {os.path.basename(path)} (định dạng cũ) được huấn luyện với {n_features} "
+                             f"đặc trưng nhưng dữ liệu hiện có {X.shape[1]}; hãy huấn luyện lại mô hình này "
+                             f"bằng training_and_tuning_model.py")
+        bundle = model_bundle.make_bundle(StandardScaler().fit(X), bundle['estimator'], X.columns, target_column)
+    return bundle
+
+
+# Thông báo lỗi nếu mô hình không dùng được với dữ liệu hiện tại, None nếu dùng được
+@lru_cache(maxsize=256)
+def _model_error_cached(path, file_mtime, features_path, features_mtime, target_column):
+    try:
+        _load_model_cached(path, file_mtime, features_path, features_mtime, target_column)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _rolling_inputs_cached(symbol, history_mtime, state_mtime, last_date):
+    history = storage.read_frame(history_path(symbol))
+    source_state = feature_store.load_state(STATE_PATH)['sources'].get(symbol)
+    return forecasting.rolling_inputs(history, last_date, source_state)
+
+
+# Các file mô hình của một mã dùng được với dữ liệu hiện tại
+def list_models(symbol):
+    model_files = _list_model_files_cached(MODEL_DIR, os.path.getmtime(MODEL_DIR))
+    return [f for f in model_files if symbol in f and model_error(f, symbol) is None]
+
+
+def model_error(model_name, symbol):
+    path = model_path(model_name)
+    features_path = data_path(symbol)
+    return _model_error_cached(path, os.path.getmtime(path), features_path, storage.mtime(features_path),
+                               f'{symbol}_close')
+
+
+# Trả về gói mô hình (scaler + estimator + thứ tự cột); symbol chỉ cần cho mô hình định dạng cũ
+def load_model(model_name, symbol):
+    path = model_path(model_name)
+    features_path = data_path(symbol)
+    return _load_model_cached(path, os.path.getmtime(path), features_path, storage.mtime(features_path),
+                              f'{symbol}_close')
+
+
+def load_features(symbol):
+    path = data_path(symbol)
+    return _load_features_cached(path, storage.mtime(path))
+
+
+def rolling_inputs(symbol, last_date):
+    state_mtime = os.path.getmtime(STATE_PATH) if os.path.exists(STATE_PATH) else 0
+    return _rolling_inputs_cached(symbol, storage.mtime(history_path(symbol)), state_mtime, last_date)
+
+
+def clear_cache():
+    _list_model_files_cached.cache_clear()
+    _load_model_cached.cache_clear()
+    _model_error_cached.cache_clear()
+    _load_features_cached.cache_clear()
+    _rolling_inputs_cached.cache_clear()
+
+
+# Tên file mô hình chung cho mọi mã (training_and_tuning_model.py --pooled)
+def pooled_model_file(model_name):
+    return f'{model_name}_pooled_tuned.joblib'
+
+
+def is_pooled(bundle):
+    return bundle.get('training_mode') == 'pooled'
+
+
+# Dòng đặc trưng cuối cùng của một mã theo thứ tự cột của mô hình. Mô hình chung dùng các cột riêng
+# của mã không có tiền tố '<mã>_' cùng cột số thứ tự của mã (bundle['symbol_column'])
+def last_row(bundle, symbol, data):
+    columns = bundle['feature_columns']
+    if not is_pooled(bundle):
+        return data[columns].iloc[-1].to_numpy(dtype=float)
+    if symbol not in bundle['symbols']:
+        raise ValueError(f"Mô hình chung không được huấn luyện với mã {symbol}")
+    last = data.iloc[-1]
+    code = bundle['symbols'].index(symbol)
+    return np.array([code if col == bundle['symbol_column']
+                     else last[f'{symbol}_{col}'] if f'{symbol}_{col}' in last.index else last[col]
+                     for col in columns], dtype=float)
+
+
+# Dự đoán đệ quy `steps` ngày tới cho các mã dùng chung một file mô hình trong một lần gọi
+# recursive_forecast (mỗi mã là một dòng của ma trận đặc trưng). Mỗi giá dự đoán được dùng để cập nhật
+# return/ma/std/ema của ngày kế tiếp thay vì dự đoán lại trên các dòng lịch sử. Trả về mảng (số mã, steps)
+def forecast_many(symbols, model_file_name, steps):
+    symbols = list(symbols)
+    with instrumentation.span('predict', symbol=','.join(symbols), model=model_file_name) as span:
+        bundle = load_model(model_file_name, symbols[0])
+        if not is_pooled(bundle) and len(symbols) > 1:
+            raise ValueError(f"{model_file_name} là mô hình riêng của một mã")
+        rows, closes, emas, means, scales = [], [], [], [], []
+        for symbol in symbols:
+            data = load_features(symbol)
+            rows.append(last_row(bundle, symbol, data))
+            close, ema, mean, scale = rolling_inputs(symbol, data.index[-1])
+            if len(close) < feature_store.WINDOW:
+                raise ValueError(f"Lịch sử giá của {symbol} chỉ có {len(close)} phiên, cần ít nhất "
+                                 f"{feature_store.WINDOW} phiên để dự đoán đệ quy")
+            closes.append(close)
+            emas.append(ema)
+            means.append(mean)
+            scales.append(scale)
+
+        layout = forecasting.feature_layout(bundle['feature_columns'], None if is_pooled(bundle) else symbols[0])
+        forecasts = forecasting.recursive_forecast(
+            model_bundle.array_predictor(bundle), np.vstack(rows), layout,
+            forecasting.RollingState(np.concatenate(closes), emas), np.vstack(means), np.vstack(scales), steps)
+        span.set(rows=steps * len(symbols), cols=len(bundle['feature_columns']))
+    return forecasts
+
+
+def forecast(symbol, model_file_name, steps):
+    return forecast_many([symbol], model_file_name, steps)[0]
+
+
+# Mỗi bước dự đoán đệ quy là một phiên giao dịch nên nhãn ngày bỏ qua thứ Bảy, Chủ nhật
+def future_dates(data, days_to_predict):
+    return list(pd.bdate_range(data.index[-1] + pd.offsets.BDay(1), periods=days_to_predict))
+
+
+# Dự đoán cho nhiều mã x mô hình x số ngày. Mỗi mã và mỗi mô hình chỉ được tải một lần;
+# dự đoán đệ quy chạy một lần tới horizon dài nhất và các horizon ngắn hơn là phần đầu của nó.
+# pooled=True dùng mô hình chung: mọi mã của một mô hình được dự đoán trong một lần gọi
+def predict_batch(symbols, model_names=None, horizons=(7,), pooled=False):
+    max_horizon = max(horizons)
+    forecasts = {}
+    if pooled:
+        if model_names is None:
+            suffix = pooled_model_file('')
+            model_files = _list_model_files_cached(MODEL_DIR, os.path.getmtime(MODEL_DIR))
+            model_names = [f[:-len(suffix)] for f in model_files if f.endswith(suffix)]
+        for model_name in model_names:
+            future_prices = forecast_many(symbols, pooled_model_file(model_name), max_horizon)
+            forecasts.update({(symbol, model_name): prices for symbol, prices in zip(symbols, future_prices)})
+    else:
+        for symbol in symbols:
+            if model_names is None:
+                suffix = f'_{symbol}_tuned.joblib'
+                names = [f[:-len(suffix)] for f in list_models(symbol) if f.endswith(suffix)]
+            else:
+                names = list(model_names)
+            for model_name in names:
+                error = model_error(model_file(model_name, symbol), symbol)
+                if error is not None:
+                    print(f"Bỏ qua {model_name} cho {symbol}: {error}")
+                    continue
+                forecasts[symbol, model_name] = forecast(symbol, model_file(model_name, symbol), max_horizon)
+
+    results = []
+    for (symbol, model_name), future_prices in forecasts.items():
+        dates = future_dates(load_features(symbol), max_horizon)
+        for horizon in horizons:
+            results.append(pd.DataFrame({
+                'Symbol': symbol,
+                'Model': model_name,
+                'Horizon': horizon,
+                'Step': np.arange(1, horizon + 1),
+                'Date': dates[:horizon],
+                'Predicted_Close': future_prices[:horizon]
+            }))
+
+    columns = ['Symbol', 'Model', 'Horizon', 'Step', 'Date', 'Predicted_Close']
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dự đoán hàng loạt cho nhiều mã cổ phiếu và mô hình')
+    parser.add_argument('--symbols', nargs='+', default=['FPT', 'HPG', 'VCB', 'VIC', 'VNM'])
+    parser.add_argument('--models', nargs='+', default=None,
+                        help='Tên mô hình, ví dụ "Ridge Regression" (mặc định: mọi mô hình đã huấn luyện)')
+    parser.add_argument('--horizons', nargs='+', type=int, default=[7])
+    parser.add_argument('--pooled', action='store_true',
+                        help='Dùng mô hình chung cho mọi mã (<tên mô hình>_pooled_tuned.joblib)')
+    parser.add_argument('--output', default='predictions.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure_from_args(args)
+
+    predictions = predict_batch(args.symbols, args.models, args.horizons, args.pooled)
+    predictions.to_csv(args.output, index=False)
+    print(f"Đã lưu {len(predictions)} dự đoán vào {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,10 @@
 import numpy as np
 import streamlit as st
 import pandas as pd
-import joblib
-import os
 import matplotlib.pyplot as plt
-from datetime import timedelta
-from sklearn.preprocessing import StandardScaler
+
+# Mô hình và dữ liệu đặc trưng được cache trong tiến trình, chỉ tải lại khi file thay đổi
+import prediction_service
 
 # Đặt style cho Matplotlib
 plt.style.use('dark_background')
@@ -18,50 +17,19 @@ st.title("Dự đoán giá cổ phiếu Việt Nam")
 stock_symbol = st.selectbox("Chọn mã cổ phiếu", ["FPT", "HPG", "VCB", "VIC", "VNM"])
 
 # Chọn mô hình
-model_files = os.listdir("..//models")
-model_files = [f for f in model_files if stock_symbol in f]
+model_files = prediction_service.list_models(stock_symbol)
 model_name = st.selectbox("Chọn mô hình", model_files)
 
 # Chọn số ngày muốn dự đoán
 days_to_predict = st.number_input("Số ngày muốn dự đoán", min_value=1, max_value=30, value=7)
 
 # Tải dữ liệu
-data_path = f"..//data//merged_{stock_symbol}_data.csv"
-data = pd.read_csv(data_path)
-
-# Đổi tên cột 'Unnamed: 0' thành 'Date' nếu nó tồn tại
-if 'Unnamed: 0' in data.columns:
-    data.rename(columns={'Unnamed: 0': 'Date'}, inplace=True)
-
-# Đảm bảo cột 'Date' được chuyển sang định dạng datetime và đặt làm chỉ mục
-data['Date'] = pd.to_datetime(data['Date'])
-data.set_index('Date', inplace=True)
-
-# Tải mô hình đã chọn
-model_path = os.path.join("../models", model_name)
-model = joblib.load(model_path)
-
-# Chuẩn bị dữ liệu đặc trưng
-target_column = f'{stock_symbol}_close'
-X = data.drop(columns=[target_column])
-y = data[target_column]
-
-# Chuẩn hóa dữ liệu
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-# Dự đoán giá trong tương lai
-future_dates = [data.index[-1] + timedelta(days=i) for i in range(1, days_to_predict + 1)]
-future_X = X_scaled[-days_to_predict:]
-
-# Đảm bảo future_X có cấu trúc giống nhau
-if future_X.shape[0] < days_to_predict:
-    last_row = future_X[-1]
-    rows_to_add = days_to_predict - future_X.shape[0]
-    future_X = np.vstack([future_X, np.tile(last_row, (rows_to_add, 1))])
-
-# Thực hiện dự đoán
-future_prices = model.predict(future_X)
+data = prediction_service.load_features(stock_symbol)
+
+# Dự đoán giá trong tương lai: dự đoán đệ quy, mỗi giá dự đoán được dùng để cập nhật
+# các đặc trưng return/ma5/ma10/std_dev/ema10 của ngày tiếp theo
+future_dates = prediction_service.future_dates(data, days_to_predict)
+future_prices = prediction_service.forecast(stock_symbol, model_name, days_to_predict)
 
 # Kiểm tra giá trị dự đoán âm
 if any(future_prices < 0):
@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from unittest import mock
+
+# Cho phép import các module của dự án và của ứng dụng
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'app'))
+
+from sklearn.linear_model import Ridge  # noqa: E402
+from sklearn.preprocessing import StandardScaler  # noqa: E402
+
+import model_bundle  # noqa: E402
+import pre_processing  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+import training_and_tuning_model as training  # noqa: E402
+
+# Quy mô dữ liệu: (số mã cổ phiếu, số phiên). 'small' giống dữ liệu hiện tại, 'large' là 500 mã x 10 năm
+SCALES = {
+    'small': (5, 1100),
+    'medium': (50, 5 * synthetic.TRADING_DAYS_PER_YEAR),
+    'large': (500, 10 * synthetic.TRADING_DAYS_PER_YEAR),
+}
+# Số mã dùng cho benchmark dashboard và dự đoán (mỗi mã một lần gọi)
+MAX_CALLBACK_SYMBOLS = 20
+FORECAST_STEPS = 7
+WARM_REPEATS = 20
+# Ngưỡng chậm hơn (tỉ lệ) so với baseline để coi là hồi quy hiệu năng
+DEFAULT_TOLERANCE = 0.2
+# Số lần đo mỗi benchmark (lấy lần nhanh nhất) và thời gian tối thiểu của mỗi lần đo: benchmark nhanh
+# được chạy lặp nhiều lần trong một lần đo để sai số hẹn giờ và nhiễu không lấn át kết quả
+DEFAULT_REPEAT = 5
+MIN_TIMING_S = 0.2
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def _time(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        result = fn()
+    return (time.perf_counter() - start) / number, result
+
+
+# Đo thời gian một lần gọi fn (lấy lần nhanh nhất trong repeat lần đo, mỗi lần đo gọi fn đủ số lần để
+# kéo dài ít nhất MIN_TIMING_S giây) và bộ nhớ cực đại trong một lần chạy riêng có tracemalloc, vì
+# tracemalloc làm chậm đáng kể. fn phải chạy lại được nhiều lần với cùng kết quả
+def measure(name, fn, rows, repeat=DEFAULT_REPEAT, memory=True):
+    # Lần chạy đầu vừa khởi động vừa ước lượng số lần gọi cần cho mỗi lần đo
+    elapsed, result = _time(fn, 1)
+    number = max(1, int(MIN_TIMING_S / elapsed) + 1) if elapsed < MIN_TIMING_S else 1
+    seconds = min(_time(fn, number)[0] for _ in range(repeat))
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+    record = {'seconds': seconds, 'rows': rows, 'rows_per_s': rows / seconds if seconds else None, 'peak_mb': peak_mb}
+    peak = f"{peak_mb:.1f} MB" if peak_mb is not None else '-'
+    print(f"{name:<28} {seconds:>10.4f} s {record['rows_per_s'] or 0:>14,.0f} dòng/s {peak:>12}")
+    return record, result
+
+
+def bench_preprocessing(frames, articles, stocks, results, repeat, memory):
+    names = list(frames)
+    n_rows = sum(len(df) for df in frames.values())
+
+    def create_all():
+        return {name: quiet(pre_processing.create_features, frames[name], name) for name in names}
+    results['create_features'], source_features = measure('create_features', create_all, n_rows, repeat, memory)
+
+    def merge_all():
+        return {stock: pre_processing.merge_stock(stock, source_features, articles) for stock in stocks}
+    results['merge'], merged = measure('merge', merge_all, sum(len(source_features[s]) for s in stocks),
+                                       repeat, memory)
+    return merged
+
+
+def bench_training(merged, model_names, results, repeat, memory):
+    data = next(iter(merged.values()))
+    X_train, X_test, y_train, y_test, scaler = training.prepare_dataset(data)
+    for model_name in model_names:
+        model, params, engine = training.configure_model(model_name)
+        results[f'tune_and_evaluate[{model_name}]'], _ = measure(
+            f'tune[{model_name}]', lambda: training.tune_and_evaluate(X_train, y_train, model, params, engine),
+            len(X_train), repeat, memory)
+
+
+# Đường dẫn dự đoán của ứng dụng Streamlit (prediction_service.forecast) trên thư mục tạm; các đường dẫn
+# của prediction_service được trả lại và thư mục tạm bị xóa khi xong
+def bench_prediction(frames, merged, symbols, results, repeat, memory):
+    import prediction_service
+
+    with tempfile.TemporaryDirectory(prefix='stock_bench_') as tmp_dir, \
+            mock.patch.object(prediction_service, 'DATA_DIR', os.path.join(tmp_dir, 'data')), \
+            mock.patch.object(prediction_service, 'MODEL_DIR', os.path.join(tmp_dir, 'models')), \
+            mock.patch.object(prediction_service, 'STATE_PATH', os.path.join(tmp_dir, 'state.json')):
+        try:
+            _bench_prediction(prediction_service, frames, merged, symbols, results, repeat, memory)
+        finally:
+            prediction_service.clear_cache()
+
+
+def _bench_prediction(prediction_service, frames, merged, symbols, results, repeat, memory):
+    os.makedirs(prediction_service.MODEL_DIR)
+    model_files = {}
+    for symbol in symbols:
+        data = merged[symbol]
+        target = f'{symbol}_close'
+        X, y = data.drop(columns=[target]), data[target]
+        storage.write_frame(data, prediction_service.data_path(symbol))
+        storage.write_frame(frames[symbol], prediction_service.history_path(symbol))
+        scaler = StandardScaler().fit(X)
+        bundle = model_bundle.make_bundle(scaler, Ridge().fit(scaler.transform(X), y), X.columns, target)
+        model_files[symbol] = prediction_service.model_file('Ridge Regression', symbol)
+        model_bundle.save_bundle(bundle, prediction_service.model_path(model_files[symbol]))
+
+    def forecast_all():
+        return [prediction_service.forecast(symbol, model_files[symbol], FORECAST_STEPS) for symbol in symbols]
+
+    def cold():
+        prediction_service.clear_cache()
+        return forecast_all()
+    results['predict_cold'], _ = measure('predict (cold)', cold, len(symbols), repeat, memory)
+
+    def warm():
+        for _ in range(WARM_REPEATS):
+            forecast_all()
+    forecast_all()
+    results['predict_warm'], _ = measure('predict (warm)', warm, len(symbols) * WARM_REPEATS, repeat, memory)
+
+
+def bench_dashboard(merged, symbols, results, repeat, memory):
+    import dashboard
+    from dashboard_cache import DashboardCache
+
+    frames = {}
+    for symbol in symbols:
+        data = merged[symbol].reset_index()
+        data['Symbol'] = symbol
+        frames[symbol] = data
+    n_rows = sum(len(df) for df in frames.values())
+
+    # Bộ nhớ đệm của dashboard được trả lại như cũ khi xong
+    with mock.patch.object(dashboard, 'cache', DashboardCache.from_frames(frames)):
+        def cold():
+            dashboard.cache = DashboardCache.from_frames(frames)
+            dashboard.build_figures.cache_clear()
+            return [dashboard.update_graphs(symbol) for symbol in symbols]
+        results['dashboard_cold'], _ = measure('dashboard (cold)', cold, n_rows, repeat, memory)
+
+        # Phân vùng và các tổng hợp đã nạp sẵn, nhưng hình vẽ được dựng lại ở mỗi lần gọi
+        def warm():
+            dashboard.build_figures.cache_clear()
+            return [dashboard.update_graphs(symbol) for symbol in symbols]
+        results['dashboard_warm'], _ = measure('dashboard (warm)', warm, n_rows, repeat, memory)
+    dashboard.build_figures.cache_clear()
+
+
+# So sánh với baseline; trả về danh sách benchmark chậm hơn hoặc tốn bộ nhớ hơn quá ngưỡng
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    print(f"\n{'benchmark':<40} {'thời gian':>10} {'bộ nhớ':>10}")
+    for name, record in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        time_ratio = record['seconds'] / base['seconds'] if base['seconds'] else 1.0
+        memory_ratio = (record['peak_mb'] / base['peak_mb']
+                        if record.get('peak_mb') and base.get('peak_mb') else 1.0)
+        flag = ''
+        if time_ratio > 1 + tolerance or memory_ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = '  <-- hồi quy'
+        print(f"{name:<40} {time_ratio:>9.2f}x {memory_ratio:>9.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark tiền xử lý, huấn luyện, dự đoán và dashboard')
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--symbols', type=int, default=None, help='Ghi đè số mã của --scale')
+    parser.add_argument('--days', type=int, default=None, help='Ghi đè số phiên của --scale')
+    parser.add_argument('--only', nargs='+', choices=['preprocessing', 'training', 'prediction', 'dashboard'],
+                        default=['preprocessing', 'training', 'prediction', 'dashboard'])
+    parser.add_argument('--train-models', nargs='+', default=['Ridge Regression'],
+                        help='Các mô hình trong training_and_tuning_model.models dùng cho benchmark huấn luyện')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Số lần đo mỗi benchmark (lấy lần nhanh nhất)')
+    parser.add_argument('--no-memory', action='store_true', help='Bỏ qua lượt đo bộ nhớ bằng tracemalloc')
+    parser.add_argument('--output', default=None, help='File JSON ghi kết quả (mặc định benchmarks/results_<scale>.json)')
+    parser.add_argument('--compare', default=None, help='File JSON baseline để so sánh')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    n_symbols, n_days = SCALES[args.scale]
+    n_symbols = args.symbols or n_symbols
+    n_days = args.days or n_days
+    memory = not args.no_memory
+    print(f"Quy mô: {n_symbols} mã x {n_days} phiên")
+
+    frames = synthetic.source_frames(n_symbols, n_days, args.seed)
+    articles = synthetic.articles(n_days, seed=args.seed)
+    stocks = synthetic.symbol_names(n_symbols)
+    callback_symbols = stocks[:MAX_CALLBACK_SYMBOLS]
+
+    results = {}
+    if 'preprocessing' in args.only:
+        merged = bench_preprocessing(frames, articles, stocks, results, args.repeat, memory)
+    else:
+        source_features, _ = quiet(pre_processing.build_source_features, frames,
+                                   callback_symbols + synthetic.INDEX_NAMES)
+        merged = {stock: pre_processing.merge_stock(stock, source_features, articles) for stock in callback_symbols}
+    if 'training' in args.only:
+        bench_training(merged, args.train_models, results, args.repeat, memory)
+    if 'prediction' in args.only:
+        bench_prediction(frames, merged, callback_symbols, results, args.repeat, memory)
+    if 'dashboard' in args.only:
+        bench_dashboard(merged, callback_symbols, results, args.repeat, memory)
+
+    report = {
+        'meta': {
+            'scale': args.scale, 'symbols': n_symbols, 'days': n_days, 'seed': args.seed,
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'created_at': datetime.now(timezone.utc).isoformat()
+        },
+        'results': results
+    }
+    output = args.output or os.path.join(ROOT_DIR, 'benchmarks', f'results_{args.scale}.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Đã lưu kết quả vào {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"Hồi quy hiệu năng: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+# Tên các chỉ số giống dữ liệu thật để pre_processing.merge_stock ghép được như bình thường
+INDEX_NAMES = ['Dollar_Index', 'Dow_Jones', 'Nasdaq', 'US_30', 'US_500']
+TRADING_DAYS_PER_YEAR = 252
+
+
+def symbol_names(n_symbols):
+    return [f'S{i:03d}' for i in range(n_symbols)]
+
+
+def trading_days(n_days, end='2024-12-31'):
+    return pd.bdate_range(end=end, periods=n_days, name='Date')
+
+
+# Chuỗi OHLCV theo random walk hình học; lowercase=True cho cột giống dữ liệu cổ phiếu (vnstock),
+# False giống dữ liệu chỉ số (yfinance)
+def ohlcv(dates, rng, lowercase=True, start_price=100.0):
+    n = len(dates)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    open_ = close * np.exp(rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0, 0.005, n)))
+    low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0, 0.005, n)))
+    volume = rng.integers(100_000, 5_000_000, n)
+    columns = ['open', 'high', 'low', 'close', 'volume']
+    if not lowercase:
+        columns = [col.capitalize() for col in columns]
+    return pd.DataFrame(dict(zip(columns, [open_, high, low, close, volume])), index=dates)
+
+
+# Dữ liệu gốc cho n_symbols mã cổ phiếu và 5 chỉ số, cùng dạng với kết quả của load_dataframes
+# (chỉ số không có cột Volume vì load_dataframes đã bỏ cột này)
+def source_frames(n_symbols, n_days, seed=42):
+    rng = np.random.default_rng(seed)
+    dates = trading_days(n_days)
+    frames = {symbol: ohlcv(dates, rng) for symbol in symbol_names(n_symbols)}
+    for name in INDEX_NAMES:
+        frames[name] = ohlcv(dates, rng, lowercase=False, start_price=1000.0).drop(columns=['Volume'])
+    return frames
+
+
+# Bài báo đã chấm điểm, cùng dạng với load_articles (chỉ mục Date, có cả ngày nghỉ)
+def articles(n_days, per_day=3, seed=42):
+    rng = np.random.default_rng(seed)
+    calendar = pd.date_range(end='2024-12-31', periods=int(n_days * 7 / 5), freq='D')
+    dates = np.sort(rng.choice(calendar.to_numpy(), size=len(calendar) * per_day))
+    n = len(dates)
+    return pd.DataFrame({
+        'Title': [f'Title {i}' for i in range(n)],
+        'Content': ['Synthetic economy article content.'] * n,
+        'sentiment_score': rng.uniform(-1, 1, n)
+    }, index=pd.DatetimeIndex(dates, name='Date'))
+
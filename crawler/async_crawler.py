@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+
+# Cho phép import các module dùng chung ở thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrumentation  # noqa: E402
+from crawl_index import INDEX_PATH, CrawlIndex, content_hash  # noqa: E402
+from newspaper_crawler import (MAX_PAGES, OUTPUT_PATH, TOPIC_URL, listing_url, parse_article, parse_listing,  # noqa: E402
+                               write_articles)
+
+# Giới hạn số kết nối đồng thời và số request mỗi giây cho mỗi host
+MAX_CONNECTIONS = 16
+REQUESTS_PER_SECOND = 8.0
+MAX_RETRIES = 3
+RETRY_BACKOFF = 1.0  # Giây, nhân đôi sau mỗi lần thử lại
+REQUEST_TIMEOUT = 10
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PAGE_BATCH = 4  # Số trang danh sách được tải đồng thời trước khi kiểm tra điều kiện dừng sớm
+
+
+class HostRateLimiter:
+    """Giãn cách các request tới cùng một host để không vượt quá rate requests/giây."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+async def fetch(session, limiter, url, retries=MAX_RETRIES, backoff=RETRY_BACKOFF):
+    for attempt in range(retries + 1):
+        await limiter.wait(url)
+        try:
+            async with session.get(url) as response:
+                if response.status in RETRY_STATUSES and attempt < retries:
+                    raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                      status=response.status)
+                response.raise_for_status()
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if attempt == retries or (isinstance(e, aiohttp.ClientResponseError) and e.status not in RETRY_STATUSES):
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def fetch_article(session, limiter, article_url):
+    try:
+        return list(parse_article(await fetch(session, limiter, article_url)))
+    except Exception as e:
+        print(f"Error loading page {article_url}: {e}")
+        return None
+
+
+async def fetch_listing(session, limiter, topic_url, page):
+    try:
+        return parse_listing(await fetch(session, limiter, listing_url(topic_url, page)))
+    except Exception as e:
+        print(f"Error loading listing page {page}: {e}")
+        return None
+
+
+# Tải đồng thời các trang danh sách (theo lô PAGE_BATCH trang) và các bài báo chưa có trong chỉ mục.
+# Khi gặp một trang chỉ gồm bài đã biết, bỏ qua phần đã crawl trước đó và tiếp tục từ trang sâu nhất
+# đã xử lý (hoặc dừng nếu đã crawl đủ num_pages trang)
+async def crawl_articles(num_pages, topic_url=TOPIC_URL, output_path=OUTPUT_PATH, index_path=INDEX_PATH,
+                         max_connections=MAX_CONNECTIONS, requests_per_second=REQUESTS_PER_SECOND):
+    num_pages = min(num_pages, MAX_PAGES)
+    limiter = HostRateLimiter(requests_per_second)
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=max_connections)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    total = 0
+    with CrawlIndex(index_path) as index:
+        backfill = index.backfill_page()
+        page = 1
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            while page <= num_pages:
+                batch = list(range(page, min(page + PAGE_BATCH, num_pages + 1)))
+                with instrumentation.span('crawl_listing', first_page=batch[0]) as span:
+                    listings = await asyncio.gather(*(fetch_listing(session, limiter, topic_url, p) for p in batch))
+                    span.set(pages=len(batch))
+
+                article_urls = []
+                last_processed = next_page = batch[-1] + 1
+                for p, urls in zip(batch, listings):
+                    if not urls:
+                        # Lỗi tải trang (thử lại ở lần chạy sau) hoặc đã hết bài trong chủ đề
+                        last_processed, next_page = p - 1, p + 1 if urls is None else num_pages + 1
+                        break
+                    unseen = index.unseen(urls)
+                    if not unseen:
+                        # Trang chỉ gồm bài đã biết: phần sau đó đã được crawl ở lần trước
+                        last_processed, next_page = max(backfill, p), max(backfill, p) + 1
+                        break
+                    article_urls.extend(url for url in unseen if url not in article_urls)
+                else:
+                    last_processed = batch[-1]
+
+                with instrumentation.span('crawl_articles', first_page=batch[0]) as span:
+                    articles = await asyncio.gather(*(fetch_article(session, limiter, url) for url in article_urls))
+                    span.set(rows=len(article_urls))
+                data = []
+                for url, article in zip(article_urls, articles):
+                    if article is None:
+                        continue
+                    digest = content_hash(*article)
+                    if not index.has_content(digest):
+                        data.append(article)
+                    index.record(url, digest)
+
+                write_articles(data, output_path)
+                if page <= backfill + 1:
+                    backfill = max(backfill, last_processed)
+                    index.set_backfill_page(backfill)
+                index.commit()
+                total += len(data)
+                page = next_page
+
+    print(f"Đã thu thập {total} bài báo mới")
+    return total
+
+
+if __name__ == "__main__":
+    num_pages = int(input("Enter the desired number of pages for crawling: "))
+    asyncio.run(crawl_articles(num_pages))
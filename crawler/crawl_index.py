@@ -0,0 +1,61 @@
+import hashlib
+import sqlite3
+from datetime import datetime, timezone
+
+INDEX_PATH = "data//crawl_index.sqlite"
+
+
+def content_hash(title, published, content):
+    return hashlib.sha256("\x1f".join([title, published, content]).encode("utf-8")).hexdigest()
+
+
+class CrawlIndex:
+    """Chỉ mục SQLite các bài báo đã tải, dùng để bỏ qua bài đã biết và tiếp tục lần crawl trước."""
+
+    def __init__(self, path=INDEX_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url TEXT PRIMARY KEY, content_hash TEXT NOT NULL, fetched_at TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (content_hash)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # Các URL chưa có trong chỉ mục, giữ nguyên thứ tự và bỏ trùng lặp
+    def unseen(self, urls):
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return []
+        placeholders = ",".join("?" * len(urls))
+        seen = {row[0] for row in self.conn.execute(
+            f"SELECT url FROM articles WHERE url IN ({placeholders})", urls)}
+        return [url for url in urls if url not in seen]
+
+    def has_content(self, digest):
+        return self.conn.execute("SELECT 1 FROM articles WHERE content_hash = ? LIMIT 1", (digest,)).fetchone() is not None
+
+    def record(self, url, digest):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO articles (url, content_hash, fetched_at) VALUES (?, ?, ?)",
+            (url, digest, datetime.now(timezone.utc).isoformat()))
+
+    # Trang danh sách sâu nhất đã được xử lý liên tục từ trang 1
+    def backfill_page(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'backfill_page'").fetchone()
+        return int(row[0]) if row else 0
+
+    def set_backfill_page(self, page):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('backfill_page', ?)", (str(page),))
+
+    def commit(self):
+        self.conn.commit()
@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Cho phép import các module dùng chung ở thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import instrumentation  # noqa: E402
+import storage  # noqa: E402
+
+CACHE_DIR = "data//cache"
+MAX_WORKERS = 8  # Số mã được tải đồng thời
+
+
+def cache_path(cache_dir, namespace, key):
+    safe_key = "".join(c if c.isalnum() or c in "-_" else "_" for c in key)
+    return os.path.join(cache_dir, f"{namespace}_{safe_key}")
+
+
+# Khoảng ngày đã tải được lưu riêng vì dữ liệu không có dòng cho ngày nghỉ
+def load_coverage(path):
+    if not os.path.exists(path + ".json"):
+        return None
+    with open(path + ".json", encoding="utf-8") as f:
+        coverage = json.load(f)
+    return date.fromisoformat(coverage["start"]), date.fromisoformat(coverage["end"])
+
+
+def save_coverage(path, start, end):
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump({"start": start.isoformat(), "end": end.isoformat()}, f)
+
+
+# Các khoảng ngày đầu và cuối cần tải thêm. Khoảng được nối liền với phần đã có trong cache
+# để cache luôn là một đoạn liên tục
+def missing_ranges(coverage, start, end):
+    if coverage is None:
+        return [(start, end)]
+    covered_start, covered_end = coverage
+    ranges = []
+    if start < covered_start:
+        ranges.append((start, covered_start - timedelta(days=1)))
+    if end > covered_end:
+        ranges.append((covered_end + timedelta(days=1), end))
+    return ranges
+
+
+def fetch_cached(provider, key, start_date, end_date, namespace, cache_dir=CACHE_DIR):
+    """Lấy dữ liệu [start_date, end_date] của một mã, chỉ gọi provider cho các ngày chưa có trong cache.
+
+    provider(key, start, end) nhận ngày dạng 'YYYY-MM-DD' (bao gồm cả end) và trả về DataFrame
+    có chỉ mục ngày.
+    """
+    start = date.fromisoformat(start_date)
+    # Không tải các ngày trong tương lai; phiên hôm nay có thể chưa kết thúc (ví dụ chỉ số Mỹ khi chạy
+    # theo giờ Việt Nam) nên chỉ đánh dấu đã tải tới hôm qua, hôm nay luôn được tải lại ở lần sau
+    end = min(date.fromisoformat(end_date), date.today())
+    complete_end = min(end, date.today() - timedelta(days=1))
+    path = cache_path(cache_dir, namespace, key)
+    coverage = load_coverage(path) if storage.exists(path) else None
+
+    cached = storage.read_frame(path) if coverage is not None else pd.DataFrame(index=pd.DatetimeIndex([]))
+    ranges = missing_ranges(coverage, start, end)
+    fetched = []
+    for range_start, range_end in ranges:
+        with instrumentation.span('fetch', namespace=namespace, key=key) as span:
+            df = span.frame(provider(key, range_start.isoformat(), range_end.isoformat()))
+        if df is not None and len(df):
+            df.index = pd.to_datetime(df.index)
+            fetched.append(df)
+
+    data = cached
+    if fetched:
+        data = pd.concat([cached] + fetched) if len(cached) else pd.concat(fetched)
+        data = data[~data.index.duplicated(keep="last")].sort_index()
+        os.makedirs(cache_dir, exist_ok=True)
+        storage.write_frame(data, path)
+    if ranges and len(data):
+        covered = (start, complete_end) if coverage is None else (min(start, coverage[0]), max(complete_end, coverage[1]))
+        if covered[0] <= covered[1]:
+            save_coverage(path, *covered)
+    data.index.name = storage.INDEX_NAME
+    return data.loc[pd.Timestamp(start):pd.Timestamp(end)] if len(data) else data
+
+
+# Tải nhiều mã song song (giới hạn max_workers luồng); mã bị lỗi hoặc không có dữ liệu được bỏ qua và in thông báo
+def fetch_many(provider, keys, start_date, end_date, namespace, cache_dir=CACHE_DIR, max_workers=MAX_WORKERS):
+    def fetch_one(key):
+        try:
+            return fetch_cached(provider, key, start_date, end_date, namespace, cache_dir)
+        except Exception as e:
+            print(f"Lỗi khi lấy dữ liệu cho {key}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = dict(zip(keys, executor.map(fetch_one, keys)))
+    for key, df in results.items():
+        if df is not None and df.empty:
+            print(f"Không có dữ liệu cho {key} trong khoảng {start_date} - {end_date}")
+    return {key: df for key, df in results.items() if df is not None and not df.empty}
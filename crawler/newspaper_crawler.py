@@ -7,18 +7,26 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from tqdm import tqdm
 
+from crawl_index import INDEX_PATH, CrawlIndex, content_hash
 
-def parse_header(raw_article):
-    soup = BeautifulSoup(raw_article, "html.parser")
+TOPIC_URL = "https://vietnamtimes.org.vn/economy"
+ARTICLES_PER_PAGE = 20
+MAX_PAGES = 236
+OUTPUT_PATH = "data//article.csv"
+
+
+def listing_url(topic_url, page):
+    return topic_url + "&s_cond=&BRSR={}".format((page - 1) * ARTICLES_PER_PAGE)
 
+
+def header_from_soup(soup):
     title = soup.find("h1", class_="article-detail-title f0")
     datetime = soup.find("span", class_="article-detail-publish")
 
     return str(title.text).strip(), str(datetime.text).strip()
 
 
-def parse_paragraph(raw_article):
-    soup = BeautifulSoup(raw_article, "html.parser")
+def paragraph_from_soup(soup):
     paragraphs = soup.find_all("p")
 
     content = ""
@@ -28,8 +36,41 @@ def parse_paragraph(raw_article):
     return str(content.strip()).strip()
 
 
-def crawl_article_by_numOfPages(num_pages):
-    num_pages = num_pages if num_pages <= 236 else 236
+def parse_header(raw_article):
+    return header_from_soup(BeautifulSoup(raw_article, "html.parser"))
+
+
+def parse_paragraph(raw_article):
+    return paragraph_from_soup(BeautifulSoup(raw_article, "html.parser"))
+
+
+# Phân tích toàn bộ trang bài báo với một BeautifulSoup duy nhất
+def parse_article(raw_page):
+    soup = BeautifulSoup(raw_page, "html.parser")
+    title, datetime = header_from_soup(soup)
+    content_wrapper = soup.select_one("div#__MB_MASTERCMS_EL_3")
+    content = paragraph_from_soup(content_wrapper) if content_wrapper is not None else ""
+    return title, datetime, content
+
+
+# Chỉ lấy bài trong khối danh sách chính (div.col-Left.lt), bỏ qua các liên kết ở sidebar và chủ đề khác;
+# nhận cả trang đầy đủ (crawler bất đồng bộ) lẫn riêng khối danh sách (Selenium)
+def parse_listing(raw_page):
+    soup = BeautifulSoup(raw_page, "html.parser")
+    wrapper = soup.select_one("div.col-Left.lt") or soup
+    return [url_wrapper.attrs["href"] for url_wrapper in wrapper.find_all("a", class_="article-image")]
+
+
+def write_articles(data, output_path=OUTPUT_PATH):
+    with open(output_path, "a", encoding="utf-8") as f:
+        write = csv.writer(f)
+        write.writerows(data)
+
+
+# Crawl tuần tự bằng Selenium (dự phòng cho crawler bất đồng bộ); dùng chung chỉ mục với async_crawler
+# để không tải lại bài đã biết và không ghi trùng bài vào article.csv
+def crawl_article_by_numOfPages(num_pages, index_path=INDEX_PATH):
+    num_pages = num_pages if num_pages <= MAX_PAGES else MAX_PAGES
 
     chrome_options = webdriver.ChromeOptions()
     chrome_options.add_argument("--headless")
@@ -37,52 +78,45 @@ def crawl_article_by_numOfPages(num_pages):
     driver = webdriver.Chrome(options=chrome_options)
     delay = 10
 
-    topic_url = "https://vietnamtimes.org.vn/economy"
-    fields = ["Title", "Datetime", "Description"]
-    for i in tqdm(range(1, num_pages + 1)):
-        data = []
-        page_url = topic_url + "&s_cond=&BRSR={}".format((i - 1) * 20)
-        driver.get(page_url)
-
-        WebDriverWait(driver, delay).until(EC.presence_of_element_located((
-            By.CSS_SELECTOR,
-            "h3.article-title"
-        )))
-        articles_wrapper = driver.find_element(By.CSS_SELECTOR, "div.col-Left.lt")
-        articles_wrapper_raw = articles_wrapper.get_attribute("outerHTML")
-        soup = BeautifulSoup(articles_wrapper_raw, "html.parser")
-
-        url_wrappers = soup.find_all("a", class_="article-image")
-        for url_wrapper in url_wrappers:
-            article_url = url_wrapper.attrs["href"]
-            print(article_url)
-            driver.get(article_url)
-
-            try:
-                WebDriverWait(driver, delay).until(EC.presence_of_element_located((
-                    By.CSS_SELECTOR,
-                    "div.google-auto-placed.ap_container")
-                ))
-            except Exception as e:
-                print(f"Error loading page {article_url}: {e}")
-                continue
-
-            info_wrapper = driver.find_element(By.CSS_SELECTOR, "div.article-detail.fw.clearfix")
-            info_wrapper_raw = info_wrapper.get_attribute("outerHTML")
-            title, datetime = parse_header(info_wrapper_raw)
-
-            content_wrapper = driver.find_element(By.CSS_SELECTOR, "div#__MB_MASTERCMS_EL_3")
-            content_wrapper_raw = content_wrapper.get_attribute("outerHTML")
-
-            content = parse_paragraph(content_wrapper_raw)
-
-            data.append([title, datetime, content])
-
-        with open("data//article.csv", "a", encoding="utf-8") as f:
-            write = csv.writer(f)
-            write.writerows(data)
-            
+    with CrawlIndex(index_path) as index:
+        for i in tqdm(range(1, num_pages + 1)):
+            data = []
+            page_url = listing_url(TOPIC_URL, i)
+            driver.get(page_url)
+
+            WebDriverWait(driver, delay).until(EC.presence_of_element_located((
+                By.CSS_SELECTOR,
+                "h3.article-title"
+            )))
+            articles_wrapper = driver.find_element(By.CSS_SELECTOR, "div.col-Left.lt")
+            articles_wrapper_raw = articles_wrapper.get_attribute("outerHTML")
+
+            for article_url in index.unseen(parse_listing(articles_wrapper_raw)):
+                print(article_url)
+                driver.get(article_url)
+
+                try:
+                    WebDriverWait(driver, delay).until(EC.presence_of_element_located((
+                        By.CSS_SELECTOR,
+                        "div.google-auto-placed.ap_container")
+                    ))
+                except Exception as e:
+                    print(f"Error loading page {article_url}: {e}")
+                    continue
+
+                article = list(parse_article(driver.page_source))
+                digest = content_hash(*article)
+                if not index.has_content(digest):
+                    data.append(article)
+                index.record(article_url, digest)
+
+            write_articles(data)
+            index.commit()
 
 if __name__ == "__main__":
+    import asyncio
+
+    from async_crawler import crawl_articles
+
     num_pages = int(input("Enter the desired number of pages for crawling: "))
-    crawl_article_by_numOfPages(num_pages)
\ No newline at end of file
+    asyncio.run(crawl_articles(num_pages))
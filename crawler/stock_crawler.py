@@ -1,11 +1,24 @@
 import datetime
 import os
+import sys
 import pandas as pd
 from vnstock3 import *
 
+# Cho phép import các module dùng chung ở thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from market_fetch import fetch_many  # noqa: E402
+
 if "ACCEPT_TC" not in os.environ:
     os.environ["ACCEPT_TC"] = "tôi đồng ý"
 
+# Provider cho market_fetch: lấy dữ liệu ngày của một mã trong [start_date, end_date]
+def vnstock_history(symbol, start_date, end_date):
+    stock = Vnstock().stock(symbol=symbol, source='VCI')
+    df = stock.quote.history(start=start_date, end=end_date, interval='1D')
+    df['time'] = pd.to_datetime(df['time'])
+    return df.set_index('time')
+
 def main():
     stock_list = ["FPT", "VCB", "HPG", "VNM", "VIC"]
 
@@ -27,13 +40,12 @@ def main():
         print("Định dạng ngày kết thúc không hợp lệ. Vui lòng nhập theo định dạng YYYY-MM-DD.")
         return
 
-    for symbol in stock_list:
-        print(f"Đang lấy dữ liệu cho mã cổ phiếu {symbol}...")
-        stock = Vnstock().stock(symbol=symbol, source='VCI')
-        df = stock.quote.history(start=start_date, end=end_date, interval='1D')
-        df['time'] = df['time'].dt.strftime('%Y-%m-%d')
-        filename = f".//data//{symbol}_history.csv"
-        df.to_csv(filename, index=False)
+    print(f"Đang lấy dữ liệu cho {len(stock_list)} mã cổ phiếu...")
+    histories = fetch_many(vnstock_history, stock_list, start_date, end_date, namespace='vnstock')
+    for symbol, df in histories.items():
+        if df.empty:
+            continue
+        filename = storage.write_frame(df, f".//data//{symbol}_history")
         print(f"Dữ liệu của mã cổ phiếu {symbol} đã được lưu vào file {filename}")
 
 if __name__ == '__main__':
@@ -1,9 +1,21 @@
 import yfinance as yf
 import pandas as pd
 import datetime
+import os
+import sys
 
+# Cho phép import các module dùng chung ở thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import storage  # noqa: E402
+from market_fetch import fetch_many  # noqa: E402
+
+# Provider cho market_fetch; yfinance không lấy ngày end nên cộng thêm một ngày
 def get_index_data(ticker, start_date, end_date):
-    data = yf.download(ticker, start=start_date, end=end_date)
+    end = (datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat()
+    data = yf.download(ticker, start=start_date, end=end, progress=False)
+    # Các phiên bản yfinance mới trả về cột MultiIndex (Price, Ticker)
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
     return data
 
 def main():
@@ -34,12 +46,14 @@ def main():
         print("Định dạng ngày kết thúc không hợp lệ. Vui lòng nhập theo định dạng YYYY-MM-DD.")
         return
 
-    # Lấy dữ liệu và lưu vào CSV
+    # Lấy dữ liệu song song (có cache) và lưu lại
+    print(f"Đang lấy dữ liệu cho {len(indices)} chỉ số...")
+    histories = fetch_many(get_index_data, list(indices.values()), start_date, end_date, namespace='yfinance')
     for name, ticker in indices.items():
-        print(f"Đang lấy dữ liệu cho chỉ số {name} ({ticker})...")
-        data = get_index_data(ticker, start_date, end_date)
-        filename = f".//data//{name.replace(' ', '_')}_history.csv"
-        data.to_csv(filename)
+        data = histories.get(ticker)
+        if data is None or data.empty:
+            continue
+        filename = storage.write_frame(data, f".//data//{name.replace(' ', '_')}_history")
         print(f"Dữ liệu của chỉ số {name} đã được lưu vào file {filename}")
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+import json
+import os
+
+import pandas as pd
+
+import indicators
+import sentiment
+import storage
+
+# Thư mục lưu đặc trưng theo từng mã và trạng thái cuộn (rolling state)
+FEATURE_DIR = 'data//features'
+STATE_PATH = os.path.join(FEATURE_DIR, 'state.json')
+
+FEATURE_COLS = ['return', 'ma5', 'ma10', 'std_dev', 'ema10']
+WINDOW = 10  # Cửa sổ dài nhất được dùng trong create_features (ma10, std_dev)
+EMA_SPAN = 10
+
+
+def close_column(df):
+    return 'Close' if 'Close' in df.columns else 'close'
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {'sources': {}, 'merged': {}}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(FEATURE_DIR, exist_ok=True)
+    tmp_path = STATE_PATH + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def has_state(state, sources, stocks):
+    return all(name in state['sources'] for name in sources) and \
+        all(stock in state['merged'] for stock in stocks)
+
+
+def features_path(label):
+    return os.path.join(FEATURE_DIR, f'{label}_features')
+
+
+def merged_path(stock):
+    return f'data//merged_{stock}_data'
+
+
+# Các đặc trưng mặc định chưa chuẩn hóa, cùng công thức với create_features trong pre_processing.py
+def compute_features(closes):
+    return indicators.indicator_frame(closes, indicators.DEFAULT_FEATURES)
+
+
+# Tham số chuẩn hóa giống create_features, dùng khi chưa có trạng thái đã lưu
+def scaler_params(raw_df):
+    features = compute_features(raw_df[close_column(raw_df)])
+    features = features.fillna(features.mean())
+    scale = features.std(ddof=0).replace(0, 1)
+    return features.mean().tolist(), scale.tolist()
+
+
+# Lưu trạng thái sau khi xây dựng lại toàn bộ: N giá đóng cửa cuối, EMA hiện tại,
+# tham số chuẩn hóa và giá trị trung bình dùng để điền giá trị khuyết
+def source_state(raw_df, scaler):
+    closes = raw_df[close_column(raw_df)]
+    ema = closes.ewm(span=EMA_SPAN, adjust=False).mean()
+    fill_means = raw_df.mean()
+    for col, mean in zip(FEATURE_COLS, scaler.mean_):
+        fill_means[col] = mean
+    return {
+        'last_date': raw_df.index[-1].strftime('%Y-%m-%d'),
+        'closes': closes.iloc[-WINDOW:].tolist(),
+        'ema10': float(ema.iloc[-1]),
+        'mean': scaler.mean_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'fill_means': fill_means.dropna().to_dict(),
+    }
+
+
+def merged_state(merged_df):
+    state = {
+        'last_date': merged_df.index[-1].strftime('%Y-%m-%d'),
+        'columns': list(merged_df.columns),
+        'fill_means': merged_df.mean().dropna().to_dict(),
+    }
+    if 'sentiment_decay' in merged_df.columns:
+        state['sentiment_decay'] = sentiment.decay_state(merged_df)
+    return state
+
+
+def write_features(label, features_df):
+    storage.write_frame(features_df, features_path(label))
+
+
+def read_features(label, start=None):
+    return storage.read_frame(features_path(label), start=start)
+
+
+# Tính đặc trưng cho các phiên mới dựa trên trạng thái đã lưu, không tính lại lịch sử
+def update_source(label, raw_df, state):
+    src = state['sources'][label]
+    new = raw_df[raw_df.index > pd.Timestamp(src['last_date'])]
+    if new.empty:
+        return new.add_prefix(f'{label}_')
+
+    close_col = close_column(new)
+    tail = pd.Series(src['closes'], dtype=float)
+    closes = pd.concat([tail, new[close_col]], ignore_index=True)
+    start = len(tail)
+
+    df = new.copy()
+    df['return'] = closes.pct_change().iloc[start:].to_numpy()
+    df['ma5'] = closes.rolling(window=5).mean().iloc[start:].to_numpy()
+    df['ma10'] = closes.rolling(window=10).mean().iloc[start:].to_numpy()
+    df['std_dev'] = closes.rolling(window=10).std().iloc[start:].to_numpy()
+    # Với adjust=False, EMA đệ quy tiếp tục chính xác từ giá trị EMA đã lưu
+    ema = pd.concat([pd.Series([src['ema10']]), new[close_col]], ignore_index=True)
+    ema = ema.ewm(span=EMA_SPAN, adjust=False).mean().iloc[1:]
+    df['ema10'] = ema.to_numpy()
+
+    df = df.fillna(pd.Series(src['fill_means']))
+    df[FEATURE_COLS] = (df[FEATURE_COLS] - src['mean']) / src['scale']
+    df.columns = [f"{label}_{col}" for col in df.columns]
+
+    src['last_date'] = new.index[-1].strftime('%Y-%m-%d')
+    src['closes'] = closes.iloc[-WINDOW:].tolist()
+    src['ema10'] = float(ema.iloc[-1])
+    return df
+
+
+# Ghép các phiên mới của một mã cổ phiếu với đặc trưng chỉ số và cảm xúc rồi nối vào file merged
+def update_merged(stock, indexes, articles_data, state):
+    m = state['merged'][stock]
+    last_date = pd.Timestamp(m['last_date'])
+    features = read_features(stock, start=last_date)
+    new = features[features.index > last_date]
+    for index in indexes:
+        new = new.join(read_features(index, start=last_date), how='inner')
+    if new.empty:
+        return new
+
+    # Chỉ các bài báo sau phiên cuối đã ghép mới thuộc về các phiên mới
+    articles_data = articles_data[articles_data.index > last_date]
+    daily = sentiment.aggregate_daily(articles_data, new.index, m.get('sentiment_decay'), last_date)
+    new = new.join(daily)
+    new = new.fillna(pd.Series(m['fill_means']))
+    new = new[m['columns']]
+    storage.append_frame(new, merged_path(stock))
+
+    m['last_date'] = new.index[-1].strftime('%Y-%m-%d')
+    if 'sentiment_decay' in m['columns']:
+        m['sentiment_decay'] = sentiment.decay_state(daily, m.get('sentiment_decay'))
+    return new
@@ -0,0 +1,98 @@
+import numpy as np
+
+import feature_store
+
+# Các cột giá trong ngày được thay bằng giá đóng cửa gần nhất khi dự đoán nhiều bước
+PRICE_COLS = ['open', 'high', 'low']
+
+
+class RollingState:
+    """Trạng thái cuộn cho nhiều chuỗi giá cùng lúc, cập nhật O(1) mỗi bước.
+
+    Giữ WINDOW giá đóng cửa gần nhất trong bộ đệm vòng cùng các tổng chạy để tính
+    return, ma5, ma10, std_dev và ema10 đúng như create_features mà không cần tính lại cửa sổ.
+    """
+
+    def __init__(self, closes, ema):
+        closes = np.array(closes, dtype=float)
+        if closes.size != len(ema) * feature_store.WINDOW:
+            raise ValueError(f"Cần {feature_store.WINDOW} giá đóng cửa gần nhất cho mỗi chuỗi để dự đoán đệ quy, "
+                             f"nhận được {closes.size} giá cho {len(ema)} chuỗi; lịch sử giá quá ngắn")
+        self.window = closes.reshape(len(ema), feature_store.WINDOW)
+        self.pos = 0  # Vị trí giá cũ nhất trong bộ đệm vòng
+        self.sum10 = self.window.sum(axis=1)
+        self.sumsq10 = (self.window ** 2).sum(axis=1)
+        self.sum5 = self.window[:, -5:].sum(axis=1)
+        self.ema = np.array(ema, dtype=float)
+        self.alpha = 2 / (feature_store.EMA_SPAN + 1)
+
+    @property
+    def last_close(self):
+        return self.window[:, (self.pos - 1) % feature_store.WINDOW]
+
+    def _features(self, prev_close):
+        n = feature_store.WINDOW
+        variance = np.maximum(self.sumsq10 - self.sum10 ** 2 / n, 0) / (n - 1)
+        ret = self.last_close / prev_close - 1
+        return np.column_stack([ret, self.sum5 / 5, self.sum10 / n, np.sqrt(variance), self.ema])
+
+    def step(self, close):
+        n = feature_store.WINDOW
+        prev_close = self.last_close.copy()
+        oldest = self.window[:, self.pos]
+        leaving5 = self.window[:, (self.pos + 5) % n]
+        self.sum10 += close - oldest
+        self.sumsq10 += close ** 2 - oldest ** 2
+        self.sum5 += close - leaving5
+        self.ema = self.alpha * close + (1 - self.alpha) * self.ema
+        self.window[:, self.pos] = close
+        self.pos = (self.pos + 1) % n
+        return self._features(prev_close)
+
+
+# Vị trí các cột đặc trưng cuộn và cột giá của một mã trong danh sách cột của mô hình. symbol=None cho
+# mô hình chung nhiều mã (--pooled), nơi các cột riêng của mã không có tiền tố '<mã>_'
+def feature_layout(feature_columns, symbol=None):
+    position = {col: i for i, col in enumerate(feature_columns)}
+    prefix = f'{symbol}_' if symbol is not None else ''
+    rolling = [(position[prefix + col], k) for k, col in enumerate(feature_store.FEATURE_COLS)
+               if prefix + col in position]
+    prices = [position[prefix + col] for col in PRICE_COLS if prefix + col in position]
+    return {
+        'rolling_idx': np.array([i for i, _ in rolling], dtype=int),
+        'rolling_features': np.array([k for _, k in rolling], dtype=int),
+        'price_idx': np.array(prices, dtype=int)
+    }
+
+
+# Giá đóng cửa gần nhất, EMA và tham số chuẩn hóa của một mã tại ngày cuối của dữ liệu merged.
+# source_state là trạng thái do feature_store lưu khi xây dựng lại toàn bộ (nếu có)
+def rolling_inputs(history, last_date, source_state=None):
+    history = history.loc[:last_date]
+    closes = history[feature_store.close_column(history)]
+    ema = closes.ewm(span=feature_store.EMA_SPAN, adjust=False).mean().iloc[-1]
+    if source_state is not None:
+        mean, scale = source_state['mean'], source_state['scale']
+    else:
+        mean, scale = feature_store.scaler_params(history)
+    return closes.iloc[-feature_store.WINDOW:].to_numpy(), ema, np.array(mean), np.array(scale)
+
+
+def recursive_forecast(predict_fn, X_last, layout, rolling, mean, scale, steps):
+    """Dự đoán đệ quy `steps` bước cho nhiều chuỗi (mỗi dòng của X_last là một chuỗi).
+
+    Sau mỗi bước, giá dự đoán được đưa vào RollingState để cập nhật return/ma/std/ema,
+    chuẩn hóa lại và ghi vào dòng đặc trưng của bước kế tiếp. Kết quả có dạng
+    (số chuỗi, steps); dự đoán cho horizon h là h cột đầu tiên. mean/scale có thể là một
+    vector dùng chung hoặc ma trận (số chuỗi, số đặc trưng) khi mỗi chuỗi có tham số chuẩn hóa riêng.
+    """
+    X = np.array(X_last, dtype=float)
+    forecasts = np.empty((X.shape[0], steps))
+    mean = np.asarray(mean)[..., layout['rolling_features']]
+    scale = np.asarray(scale)[..., layout['rolling_features']]
+    for t in range(steps):
+        forecasts[:, t] = predict_fn(X)
+        features = rolling.step(forecasts[:, t])[:, layout['rolling_features']]
+        X[:, layout['rolling_idx']] = (features - mean) / scale
+        X[:, layout['price_idx']] = forecasts[:, [t]]
+    return forecasts
@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+# Mỗi đặc trưng là một bộ (tên cột, loại chỉ báo, tham số). Bộ mặc định trùng với
+# 5 đặc trưng cũ của create_features để giữ nguyên tên cột và trạng thái đã lưu
+DEFAULT_FEATURES = [
+    ('return', 'return', {}),
+    ('ma5', 'sma', {'window': 5}),
+    ('ma10', 'sma', {'window': 10}),
+    ('std_dev', 'std', {'window': 10}),
+    ('ema10', 'ema', {'span': 10}),
+]
+
+
+# Tạo danh sách đặc trưng cho nhiều cửa sổ và nhiều loại chỉ báo cùng lúc
+def feature_set(sma=(), ema=(), std=(), rsi=(), macd=(), atr=(), bollinger=(), lags=(), returns=True):
+    features = [('return', 'return', {})] if returns else []
+    features += [(f'ma{w}', 'sma', {'window': w}) for w in sma]
+    features += [(f'ema{s}', 'ema', {'span': s}) for s in ema]
+    features += [(f'std{w}', 'std', {'window': w}) for w in std]
+    features += [(f'rsi{w}', 'rsi', {'window': w}) for w in rsi]
+    features += [(f'macd_{f}_{s}_{g}', 'macd', {'fast': f, 'slow': s, 'signal': g}) for f, s, g in macd]
+    features += [(f'atr{w}', 'atr', {'window': w}) for w in atr]
+    features += [(f'bb{w}_{k:g}', 'bollinger', {'window': w, 'k': k}) for w, k in bollinger]
+    features += [(f'return_lag{k}', 'lag_return', {'lag': k}) for k in lags]
+    return features
+
+
+def _first_valid(values):
+    idx = np.argmax(~np.isnan(values), axis=0)
+    first = values[idx, np.arange(values.shape[1])]
+    return np.where(np.isnan(first), 0.0, first)
+
+
+class RollingSums:
+    """Tổng tích lũy của một mảng giá, dùng chung cho mọi cửa sổ của SMA, độ lệch chuẩn và Bollinger.
+
+    Chi phí mỗi cửa sổ không phụ thuộc độ dài cửa sổ. Giá trị được trừ đi giá trị hợp lệ đầu tiên
+    của mỗi cột để giảm sai số khi lấy hiệu hai tổng lớn; NaN làm cửa sổ chứa nó thành NaN.
+    """
+
+    def __init__(self, values):
+        self.offset = _first_valid(values)
+        centered = values - self.offset
+        valid = ~np.isnan(centered)
+        centered = np.where(valid, centered, 0.0)
+        self.total = self._cumsum(centered)
+        self.total_sq = self._cumsum(centered * centered)
+        self.count = self._cumsum(valid.astype(float))
+
+    @staticmethod
+    def _cumsum(values):
+        out = np.zeros((values.shape[0] + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=out[1:])
+        return out
+
+    @staticmethod
+    def _window_diff(cumsum, window):
+        out = np.full((cumsum.shape[0] - 1, cumsum.shape[1]), np.nan)
+        if window <= out.shape[0]:
+            np.subtract(cumsum[window:], cumsum[:-window], out=out[window - 1:])
+        return out
+
+    def _full(self, window):
+        return self._window_diff(self.count, window) == window
+
+    def mean(self, window):
+        return np.where(self._full(window), self._window_diff(self.total, window) / window + self.offset, np.nan)
+
+    def std(self, window):
+        sums = self._window_diff(self.total, window)
+        variance = (self._window_diff(self.total_sq, window) - sums ** 2 / window) / (window - 1)
+        return np.where(self._full(window), np.sqrt(np.maximum(variance, 0)), np.nan)
+
+
+def rolling_mean(values, window):
+    return RollingSums(values).mean(window)
+
+
+def rolling_std(values, window):
+    return RollingSums(values).std(window)
+
+
+# EMA đệ quy (adjust=False) cho mọi cột cùng lúc, bắt đầu từ giá trị hợp lệ đầu tiên của mỗi cột.
+# NaN ở giữa chuỗi được thay bằng giá trị trước đó
+def ewm_mean(values, alpha):
+    leading = np.cumsum(~np.isnan(values), axis=0) == 0
+    filled = pd.DataFrame(values).ffill().to_numpy()
+    first = _first_valid(values)
+    filled = np.where(leading, first, filled)
+    out = lfilter([alpha], [1.0, alpha - 1.0], filled, axis=0, zi=((1 - alpha) * first)[np.newaxis, :])[0]
+    return np.where(leading, np.nan, out)
+
+
+def pct_change(values, periods=1):
+    out = np.full_like(values, np.nan)
+    out[periods:] = values[periods:] / values[:-periods] - 1
+    return out
+
+
+def rsi(close, window):
+    delta = np.diff(close, axis=0, prepend=np.nan)
+    gain = ewm_mean(np.where(np.isnan(delta), np.nan, np.maximum(delta, 0)), 1 / window)
+    loss = ewm_mean(np.where(np.isnan(delta), np.nan, np.maximum(-delta, 0)), 1 / window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = 100 - 100 / (1 + gain / loss)
+    return np.where(loss == 0, 100.0, out)
+
+
+def true_range(close, high=None, low=None):
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    if high is None or low is None:
+        return np.abs(close - prev_close)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def _compute(kind, params, close, high, low, sums):
+    if kind == 'return':
+        return {'': pct_change(close)}
+    if kind == 'lag_return':
+        out = np.full_like(close, np.nan)
+        out[params['lag']:] = pct_change(close)[:-params['lag']]
+        return {'': out}
+    if kind == 'sma':
+        return {'': sums.mean(params['window'])}
+    if kind == 'std':
+        return {'': sums.std(params['window'])}
+    if kind == 'ema':
+        return {'': ewm_mean(close, 2 / (params['span'] + 1))}
+    if kind == 'rsi':
+        return {'': rsi(close, params['window'])}
+    if kind == 'macd':
+        macd = ewm_mean(close, 2 / (params['fast'] + 1)) - ewm_mean(close, 2 / (params['slow'] + 1))
+        signal = ewm_mean(macd, 2 / (params['signal'] + 1))
+        return {'': macd, '_signal': signal, '_hist': macd - signal}
+    if kind == 'atr':
+        return {'': ewm_mean(true_range(close, high, low), 1 / params['window'])}
+    if kind == 'bollinger':
+        mid = sums.mean(params['window'])
+        band = params['k'] * sums.std(params['window'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return {'_pctb': (close - (mid - band)) / (2 * band), '_width': 2 * band / mid}
+    raise ValueError(f"Loại chỉ báo không hợp lệ: {kind}")
+
+
+def _compute_all(close, features, high, low):
+    close = np.asarray(close, dtype=float)
+    high = np.asarray(high, dtype=float) if high is not None else None
+    low = np.asarray(low, dtype=float) if low is not None else None
+    sums = RollingSums(close)
+    names, outputs = [], []
+    for name, kind, params in features:
+        for suffix, values in _compute(kind, params, close, high, low, sums).items():
+            names.append(name + suffix)
+            outputs.append(values)
+    return names, outputs
+
+
+def compute_panel(close, features=DEFAULT_FEATURES, high=None, low=None):
+    """Tính mọi đặc trưng cho mảng giá (số phiên x số mã) và trả về (mảng 3 chiều, danh sách tên).
+
+    Kết quả có dạng (số đặc trưng, số phiên, số mã). high/low (cùng dạng với close) chỉ dùng cho ATR;
+    nếu không có, true range được tính từ giá đóng cửa.
+    """
+    names, outputs = _compute_all(close, features, high, low)
+    return np.stack(outputs), names
+
+
+# Bảng đặc trưng cho một chuỗi giá (Series) hoặc nhiều mã (DataFrame rộng, mỗi cột một mã).
+# Với nhiều mã, tên cột có dạng '<mã>_<đặc trưng>' và các cột được xếp theo từng đặc trưng
+def indicator_frame(close, features=DEFAULT_FEATURES, high=None, low=None):
+    if isinstance(close, pd.Series):
+        names, outputs = _compute_all(close.to_numpy()[:, np.newaxis], features,
+                                      None if high is None else np.asarray(high)[:, np.newaxis],
+                                      None if low is None else np.asarray(low)[:, np.newaxis])
+        return pd.DataFrame(np.hstack(outputs), index=close.index, columns=names)
+
+    names, outputs = _compute_all(close.to_numpy(), features, high, low)
+    columns = [f'{symbol}_{name}' for name in names for symbol in close.columns]
+    return pd.DataFrame(np.hstack(outputs), index=close.index, columns=columns)
@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Nơi ghi số liệu của các giai đoạn: đường dẫn file, '-' cho stderr, để trống để tắt.
+# Định dạng 'jsonl' (mỗi span một dòng JSON) hoặc 'prometheus' (file text exposition,
+# ghi đè sau mỗi span; nên dùng jsonl khi chạy nhiều tiến trình)
+METRICS_PATH = os.environ.get('STOCK_METRICS', '')
+METRICS_FORMAT = os.environ.get('STOCK_METRICS_FORMAT', 'jsonl')
+# In các bảng dữ liệu trung gian (df.head()) để gỡ lỗi; đặt STOCK_DEBUG=0 để tắt
+DEBUG = os.environ.get('STOCK_DEBUG', '1').lower() not in ('0', 'false', 'no', '')
+
+METRIC_PREFIX = 'stock_pipeline'
+
+_lock = threading.Lock()
+_registry = {}
+
+
+# Cấu hình được ghi cả vào biến môi trường để các tiến trình con (ProcessPoolExecutor, joblib)
+# dùng cùng nơi ghi số liệu
+def configure(path=None, fmt=None, debug=None):
+    global METRICS_PATH, METRICS_FORMAT, DEBUG
+    if path is not None:
+        METRICS_PATH = os.environ['STOCK_METRICS'] = path
+    if fmt is not None:
+        if fmt not in ('jsonl', 'prometheus'):
+            raise ValueError(f"Định dạng số liệu không hợp lệ: {fmt}")
+        METRICS_FORMAT = os.environ['STOCK_METRICS_FORMAT'] = fmt
+    if debug is not None:
+        DEBUG = debug
+        os.environ['STOCK_DEBUG'] = '1' if debug else '0'
+
+
+def debug(*args, **kwargs):
+    if DEBUG:
+        print(*args, **kwargs)
+
+
+# Bộ nhớ thường trú hiện tại của tiến trình (byte); None nếu không đọc được
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class Span:
+    """Một giai đoạn được đo: thời gian, thay đổi bộ nhớ và các trường tùy ý (rows, cols, ...)."""
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+        self.fields = {}
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    # Ghi số dòng/cột của DataFrame (hoặc mảng) đầu ra của giai đoạn
+    def frame(self, df):
+        shape = getattr(df, 'shape', None)
+        if shape is not None:
+            self.fields['rows'] = shape[0]
+            if len(shape) > 1:
+                self.fields['cols'] = shape[1]
+        return df
+
+
+@contextmanager
+def span(stage, **labels):
+    current = Span(stage, labels)
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield current
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        if METRICS_PATH:
+            rss_after = rss_bytes()
+            emit({
+                'ts': datetime.now(timezone.utc).isoformat(),
+                'stage': stage,
+                'labels': {key: str(value) for key, value in labels.items()},
+                'status': status,
+                'duration_s': time.perf_counter() - start,
+                'rss_bytes': rss_after,
+                'rss_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                'pid': os.getpid(),
+                **current.fields
+            })
+
+
+def emit(record):
+    if METRICS_FORMAT == 'prometheus':
+        _update_registry(record)
+        _write(_prometheus_text(), mode='w')
+    else:
+        _write(json.dumps(record, default=str) + '\n', mode='a')
+
+
+def _write(text, mode):
+    with _lock:
+        if METRICS_PATH == '-':
+            sys.stderr.write(text)
+            return
+        os.makedirs(os.path.dirname(METRICS_PATH) or '.', exist_ok=True)
+        if mode == 'a':
+            with open(METRICS_PATH, 'a', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            tmp_path = METRICS_PATH + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, METRICS_PATH)
+
+
+def _label_text(record):
+    labels = {'stage': record['stage'], **record['labels']}
+    return ','.join(f'{key}="{str(value)}"' for key, value in sorted(labels.items()))
+
+
+def _update_registry(record):
+    with _lock:
+        key = _label_text(record)
+        entry = _registry.setdefault(key, {'count': 0, 'errors': 0, 'duration_sum': 0.0, 'rows_sum': 0})
+        entry['count'] += 1
+        entry['errors'] += record['status'] == 'error'
+        entry['duration_sum'] += record['duration_s']
+        entry['rows_sum'] += record.get('rows') or 0
+        entry['duration_last'] = record['duration_s']
+        entry['rss_delta_last'] = record['rss_delta_bytes'] or 0
+
+
+def _prometheus_text():
+    metrics = [
+        ('stage_duration_seconds_sum', 'counter', 'duration_sum', 'Tổng thời gian chạy của giai đoạn'),
+        ('stage_runs_total', 'counter', 'count', 'Số lần chạy giai đoạn'),
+        ('stage_errors_total', 'counter', 'errors', 'Số lần giai đoạn bị lỗi'),
+        ('stage_rows_total', 'counter', 'rows_sum', 'Tổng số dòng đầu ra của giai đoạn'),
+        ('stage_duration_seconds_last', 'gauge', 'duration_last', 'Thời gian chạy gần nhất của giai đoạn'),
+        ('stage_rss_delta_bytes_last', 'gauge', 'rss_delta_last', 'Thay đổi bộ nhớ thường trú ở lần chạy gần nhất'),
+    ]
+    lines = []
+    with _lock:
+        for name, kind, field, help_text in metrics:
+            lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+            for labels, entry in _registry.items():
+                lines.append(f'{METRIC_PREFIX}_{name}{{{labels}}} {entry[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+# Thêm các tùy chọn dòng lệnh chung cho số liệu và in gỡ lỗi
+def add_arguments(parser):
+    parser.add_argument('--metrics', default=None,
+                        help="Ghi số liệu từng giai đoạn vào file này ('-' cho stderr); mặc định theo STOCK_METRICS")
+    parser.add_argument('--metrics-format', choices=['jsonl', 'prometheus'], default=None)
+    parser.add_argument('--quiet', action='store_true', help='Không in các bảng dữ liệu trung gian')
+
+
+def configure_from_args(args):
+    configure(path=args.metrics, fmt=args.metrics_format, debug=False if args.quiet else None)
@@ -0,0 +1,59 @@
+import os
+
+import joblib
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Phiên bản định dạng gói mô hình; tăng khi cấu trúc thay đổi
+BUNDLE_VERSION = 1
+
+
+# Gói scaler, thứ tự cột đặc trưng và estimator thành một artifact duy nhất
+def make_bundle(scaler, estimator, feature_columns, target_column, **metadata):
+    return {
+        'format_version': BUNDLE_VERSION,
+        'pipeline': Pipeline([('scaler', scaler), ('model', estimator)]),
+        'feature_columns': list(feature_columns),
+        'target_column': target_column,
+        **metadata
+    }
+
+
+# Không nén để các mảng numpy lớn (cây của RandomForest) có thể memory-map khi tải.
+# Ghi ra file tạm rồi thay thế để không ghi đè tại chỗ lên file đang được memory-map
+# hoặc được hard link từ cache mô hình (xem model_cache.publish)
+def save_bundle(bundle, path):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    joblib.dump(bundle, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(path, mmap=False):
+    obj = joblib.load(path, mmap_mode='r' if mmap else None)
+    if isinstance(obj, dict) and 'format_version' in obj:
+        return obj
+    # Định dạng cũ chỉ lưu estimator, scaler phải được dựng lại bởi nơi gọi
+    return {'format_version': 0, 'pipeline': None, 'estimator': obj}
+
+
+def is_legacy(bundle):
+    return bundle['pipeline'] is None
+
+
+def predict(bundle, X):
+    return bundle['pipeline'].predict(X[bundle['feature_columns']])
+
+
+# Hàm dự đoán trên mảng numpy có cột theo đúng thứ tự feature_columns, dùng cho dự đoán đệ quy nhiều
+# bước: chuẩn hóa trực tiếp bằng mean_/scale_ của StandardScaler thay vì dựng DataFrame và kiểm tra
+# tên cột ở mỗi bước. Các pipeline khác vẫn đi qua predict với DataFrame
+def array_predictor(bundle):
+    pipeline = bundle['pipeline']
+    scaler, estimator = pipeline[0], pipeline[-1]
+    if len(pipeline) == 2 and isinstance(scaler, StandardScaler) and not hasattr(estimator, 'feature_names_in_'):
+        mean = scaler.mean_ if scaler.with_mean else 0
+        scale = scaler.scale_ if scaler.with_std else 1
+        return lambda X: estimator.predict((X - mean) / scale)
+    columns = bundle['feature_columns']
+    return lambda X: pipeline.predict(pd.DataFrame(X, columns=columns))
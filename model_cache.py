@@ -0,0 +1,96 @@
+import hashlib
+import os
+import shutil
+import sys
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+
+import model_bundle
+
+# Cache mô hình theo nội dung: mỗi mục '<MODEL_CACHE_DIR>/<khóa>/' chứa bundle đã huấn luyện và kết quả
+# đánh giá; khóa là hash của dữ liệu huấn luyện/kiểm tra, danh sách cột, lớp và tham số mô hình,
+# không gian tham số và chiến lược tìm kiếm
+MODEL_CACHE_DIR = 'models//cache'
+MODEL_CACHE_VERSION = 1
+# Các mục không được dùng lại trong khoảng này sẽ bị xóa bởi prune
+MODEL_CACHE_MAX_AGE_DAYS = 30
+
+BUNDLE_FILE = 'bundle.joblib'
+RESULT_FILE = 'result.joblib'
+
+
+def job_key(arrays, feature_columns, model, params, engine, extra=()):
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(repr((array.dtype.str, array.shape)).encode('utf-8'))
+        digest.update(array.tobytes())
+
+    # Số luồng chỉ ảnh hưởng tốc độ, không ảnh hưởng mô hình nên không đưa vào khóa
+    model = clone(model)
+    if 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=None)
+    package = sys.modules[type(model).__module__.split('.')[0]]
+    digest.update(repr((
+        list(feature_columns), type(model).__module__, type(model).__qualname__,
+        getattr(package, '__version__', None), sorted(model.get_params(deep=False).items()),
+        params, engine, extra, MODEL_CACHE_VERSION
+    )).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def entry_dir(key, cache_dir=MODEL_CACHE_DIR):
+    return os.path.join(cache_dir, key)
+
+
+# Kết quả đã lưu của khóa, hoặc None nếu chưa có
+def load(key, cache_dir=MODEL_CACHE_DIR):
+    path = entry_dir(key, cache_dir)
+    if not (os.path.exists(os.path.join(path, BUNDLE_FILE)) and os.path.exists(os.path.join(path, RESULT_FILE))):
+        return None
+    # Đánh dấu mục vừa được dùng để prune giữ lại
+    os.utime(path)
+    return joblib.load(os.path.join(path, RESULT_FILE))
+
+
+def store(key, bundle, result, cache_dir=MODEL_CACHE_DIR):
+    path = entry_dir(key, cache_dir)
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    os.makedirs(tmp_path, exist_ok=True)
+    model_bundle.save_bundle(bundle, os.path.join(tmp_path, BUNDLE_FILE))
+    joblib.dump(result, os.path.join(tmp_path, RESULT_FILE))
+    # Ghi vào thư mục tạm rồi đổi tên để tiến trình khác không đọc phải mục ghi dở
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+# Đặt bundle của khóa tại model_path (file mô hình mà ứng dụng đọc). Dùng hard link để không nhân
+# đôi dung lượng các mô hình lớn; nếu hệ thống tệp không hỗ trợ thì sao chép
+def publish(key, model_path, cache_dir=MODEL_CACHE_DIR):
+    source = os.path.join(entry_dir(key, cache_dir), BUNDLE_FILE)
+    if os.path.exists(model_path):
+        if os.path.samefile(source, model_path):
+            return model_path
+        os.remove(model_path)
+    try:
+        os.link(source, model_path)
+    except OSError:
+        shutil.copyfile(source, model_path)
+    return model_path
+
+
+# Xóa các mục không được dùng lại trong max_age_days ngày; trả về số mục đã xóa
+def prune(cache_dir=MODEL_CACHE_DIR, max_age_days=MODEL_CACHE_MAX_AGE_DAYS):
+    if not os.path.isdir(cache_dir):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
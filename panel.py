@@ -0,0 +1,148 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import storage
+
+# Dữ liệu merged của mọi mã dạng panel: '<PANEL_PATH>_stocks' (dạng dài), '<PANEL_PATH>_shared'
+# (đặc trưng chỉ số dùng chung) và '<PANEL_PATH>.json' (mô tả cột)
+PANEL_PATH = 'data//panel'
+# Các nguồn có đặc trưng giống nhau cho mọi mã (xem pre_processing.indexes)
+SHARED_SOURCES = ['Dollar_Index', 'Dow_Jones', 'Nasdaq', 'US_30', 'US_500']
+SYMBOL_COL = 'Symbol'
+DTYPE = 'float32'
+
+
+class Panel:
+    """Dữ liệu merged của nhiều mã cổ phiếu, lưu một lần cho mỗi giá trị.
+
+    stocks: dạng dài, chỉ mục 'Date', cột 'Symbol' kiểu categorical, sắp theo (Symbol, Date), các cột
+    riêng của từng mã đã bỏ tiền tố '<mã>_' (open, close, return, ...) cùng các cột cảm xúc.
+    shared: dạng rộng, chỉ mục 'Date', các đặc trưng chỉ số (Dollar_Index_Close, ...) lưu một lần.
+    Bộ nhớ tăng theo (số mã + số chỉ số) x số phiên thay vì theo hợp các cột của mọi mã.
+    """
+
+    def __init__(self, stocks, shared, prefixed, unprefixed):
+        self.stocks = stocks
+        self.shared = shared
+        # Cột dạng dài có tiền tố mã khi chuyển về dạng rộng (prefixed) hoặc giữ nguyên tên (unprefixed)
+        self.prefixed = list(prefixed)
+        self.unprefixed = list(unprefixed)
+        codes = stocks[SYMBOL_COL].cat.codes.to_numpy()
+        bounds = np.searchsorted(codes, np.arange(len(self.symbols) + 1))
+        self._rows = {symbol: (bounds[i], bounds[i + 1]) for i, symbol in enumerate(self.symbols)}
+
+    @property
+    def symbols(self):
+        return list(self.stocks[SYMBOL_COL].cat.categories)
+
+    @classmethod
+    def from_merged(cls, frames, shared_sources=SHARED_SOURCES, dtype=DTYPE):
+        """Tạo panel từ các DataFrame merged dạng rộng {mã: DataFrame} của pre_processing."""
+        shared_prefixes = tuple(f'{source}_' for source in shared_sources)
+        long_frames, shared_frames = [], []
+        prefixed, unprefixed, shared_cols = {}, {}, {}
+        for symbol, df in frames.items():
+            own = [col for col in df.columns if col.startswith(f'{symbol}_')]
+            shared = [col for col in df.columns if col.startswith(shared_prefixes)]
+            other = [col for col in df.columns if col not in own and col not in shared]
+            prefixed.update(dict.fromkeys(col[len(symbol) + 1:] for col in own))
+            unprefixed.update(dict.fromkeys(other))
+            shared_cols.update(dict.fromkeys(shared))
+
+            long_df = df[own + other].astype(dtype)
+            long_df.columns = [col[len(symbol) + 1:] for col in own] + other
+            long_df.insert(0, SYMBOL_COL, symbol)
+            long_frames.append(long_df)
+            shared_frames.append(df[shared].astype(dtype))
+
+        symbols = sorted(frames)
+        stocks = pd.concat(long_frames)[[SYMBOL_COL] + list(prefixed) + list(unprefixed)]
+        stocks[SYMBOL_COL] = pd.Categorical(stocks[SYMBOL_COL], categories=symbols)
+        stocks = stocks.sort_values(SYMBOL_COL, kind='stable')
+        # Giá trị chỉ số của cùng một ngày giống nhau ở mọi mã, chỉ giữ một bản
+        shared = pd.concat(shared_frames)[list(shared_cols)]
+        shared = shared[~shared.index.duplicated()].sort_index()
+        return cls(stocks, shared, prefixed, unprefixed)
+
+    # Các dòng của một mã trong bảng dạng dài (đã sắp theo mã nên là một lát cắt liên tục)
+    def rows(self, symbol):
+        lo, hi = self._rows[symbol]
+        return self.stocks.iloc[lo:hi]
+
+    def wide_columns(self, symbol):
+        return [f'{symbol}_{col}' for col in self.prefixed] + list(self.shared.columns) + self.unprefixed
+
+    def to_wide(self, symbol, columns=None, dtype=None):
+        """DataFrame dạng rộng của một mã, cùng cột và thứ tự với file merged_<mã>_data."""
+        columns = self.wide_columns(symbol) if columns is None else list(columns)
+        prefix = f'{symbol}_'
+        own = {col: col[len(prefix):] for col in columns
+               if col.startswith(prefix) and col[len(prefix):] in self.prefixed}
+        rows = self.rows(symbol)
+        data = rows[[own.get(col, col) for col in columns if col not in self.shared.columns]]
+        data.columns = [col for col in columns if col not in self.shared.columns]
+        shared = [col for col in columns if col in self.shared.columns]
+        if shared:
+            values = self.shared[shared].reindex(rows.index)
+            data = pd.concat([data, values], axis=1)[columns]
+        return data.astype(dtype) if dtype is not None else data
+
+    # Dạng dài kèm đặc trưng dùng chung của mỗi phiên, cho mô hình chung nhiều mã
+    def long_frame(self, symbols=None):
+        stocks = self.stocks if symbols is None else pd.concat([self.rows(symbol) for symbol in symbols])
+        return pd.concat([stocks, self.shared.reindex(stocks.index)], axis=1)
+
+    def memory_usage(self):
+        return int(self.stocks.memory_usage(deep=True).sum() + self.shared.memory_usage(deep=True).sum())
+
+    def save(self, path=PANEL_PATH):
+        storage.write_frame(self.stocks, f'{path}_stocks')
+        storage.write_frame(self.shared, f'{path}_shared')
+        meta = {'symbols': self.symbols, 'prefixed': self.prefixed, 'unprefixed': self.unprefixed}
+        with open(f'{path}.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path=PANEL_PATH, dtype=DTYPE):
+        with open(f'{path}.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        # Parquet giữ kiểu dữ liệu; CSV thì cần ép lại categorical/float32
+        stocks = storage.read_frame(f'{path}_stocks')
+        stocks[SYMBOL_COL] = pd.Categorical(stocks[SYMBOL_COL].astype(str), categories=meta['symbols'])
+        # Các dòng nối thêm bởi append nằm ở file riêng nên cần sắp lại theo (mã, ngày)
+        stocks = stocks.sort_values([SYMBOL_COL, stocks.index.name], kind='stable')
+        values = [col for col in stocks.columns if col != SYMBOL_COL]
+        stocks[values] = stocks[values].astype(dtype)
+        shared = storage.read_frame(f'{path}_shared').astype(dtype).sort_index()
+        return cls(stocks, shared, meta['prefixed'], meta['unprefixed'])
+
+
+# Nối các dòng merged mới {mã: DataFrame} vào panel đã lưu mà không đọc lại lịch sử của các mã.
+# Chỉ đọc chỉ mục ngày của bảng dùng chung từ năm của dòng mới nhất để bỏ các ngày đã có.
+# Báo ValueError nếu mã hoặc cột khác panel đã lưu (khi đó cần from_merged + save)
+def append(frames, path=PANEL_PATH, shared_sources=SHARED_SOURCES, dtype=DTYPE):
+    frames = {symbol: df for symbol, df in frames.items() if len(df)}
+    if not frames:
+        return 0
+    with open(f'{path}.json', encoding='utf-8') as f:
+        meta = json.load(f)
+    new = Panel.from_merged(frames, shared_sources, dtype)
+    if not set(new.symbols) <= set(meta['symbols']) or new.prefixed != meta['prefixed'] \
+            or new.unprefixed != meta['unprefixed']:
+        raise ValueError("Mã hoặc cột của dữ liệu mới khác panel đã lưu")
+
+    stocks = new.stocks.copy()
+    stocks[SYMBOL_COL] = pd.Categorical(stocks[SYMBOL_COL].astype(str), categories=meta['symbols'])
+    storage.append_frame(stocks, f'{path}_stocks')
+    saved = storage.read_frame(f'{path}_shared', columns=list(new.shared.columns[:1]), start=new.shared.index.min())
+    shared = new.shared[~new.shared.index.isin(saved.index)]
+    if len(shared):
+        storage.append_frame(shared, f'{path}_shared')
+    return len(stocks)
+
+
+def exists(path=PANEL_PATH):
+    return os.path.exists(f'{path}.json') and storage.exists(f'{path}_stocks') and storage.exists(f'{path}_shared')
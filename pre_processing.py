@@ -1,128 +1,316 @@
+import argparse
+
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
-# Tải dữ liệu
-file_path = 'data//article.csv'  
-data = pd.read_csv(file_path)
+import feature_store
+import indicators
+import instrumentation
+import panel
+import sentiment
+import storage
 
-# Đặt tên cột phù hợp
-data.columns = ['Title', 'Date', 'Content']
+# Đường dẫn đến các file dữ liệu (không kèm phần mở rộng, xem storage.py)
+file_paths = [
+    ('Dollar_Index', 'data//Dollar_Index_history'),
+    ('Dow_Jones', 'data//Dow_Jones_history'),
+    ('FPT', 'data//FPT_history'),
+    ('HPG', 'data//HPG_history'),
+    ('Nasdaq', 'data//Nasdaq_history'),
+    ('US_30', 'data//US_30_history'),
+    ('US_500', 'data//US_500_history'),
+    ('VCB', 'data//VCB_history'),
+    ('VIC', 'data//VIC_history'),
+    ('VNM', 'data//VNM_history')
+]
 
-# Chia cột Date thành hai phần Date và Time
-split_date_time = data['Date'].str.split(' \| ', expand=True)
-data[['Date', 'Time']] = split_date_time
+stocks = ['FPT', 'HPG', 'VCB', 'VIC', 'VNM']
+indexes = ['Dollar_Index', 'Dow_Jones', 'Nasdaq', 'US_30', 'US_500']
 
-# Chuyển đổi cột Date sang định dạng datetime
-data['Date'] = pd.to_datetime(data['Date'], format='%b %d, %Y', errors='coerce')
+articles_path = 'data//preprocessed_articles_with_sentiment.csv'
 
-# Loại bỏ cột Time vì không cần thiết cho phân tích này
-data.drop(columns=['Time'], inplace=True)
+# Cách điền giá trị khuyết mặc định: 'mean', 'ffill' hoặc 'time' (xem fill_missing_values).
+# Chế độ --incremental luôn điền bằng trung bình đã lưu trong trạng thái
+FILL_STRATEGY = 'mean'
 
-# Khởi tạo bộ phân tích cảm xúc VADER
-analyzer = SentimentIntensityAnalyzer()
 
-# Tính toán sentiment scores cho cột Content
-data['sentiment_score'] = data['Content'].apply(lambda x: analyzer.polarity_scores(x)['compound'])
+def score_articles(workers=None):
+    # Đọc dữ liệu theo từng phần để không phải nạp toàn bộ file bài báo vào bộ nhớ
+    file_path = 'data//article.csv'
+    chunks = pd.read_csv(file_path, chunksize=sentiment.CHUNK_SIZE)
 
-# Lưu lại dữ liệu đã tiền xử lý vào tệp CSV mới
-output_file_path = 'data//preprocessed_articles_with_sentiment.csv'
-data.to_csv(output_file_path, index=False)
+    # Bộ chấm điểm VADER song song, có cache theo hash nội dung
+    with sentiment.SentimentScorer(workers) as scorer:
+        for i, data in enumerate(chunks):
+            # Đặt tên cột phù hợp
+            data.columns = ['Title', 'Date', 'Content']
 
-# Hiển thị thông báo hoàn thành
-print(f"Dữ liệu đã được lưu vào tệp: {output_file_path}")
+            # Chia cột Date thành hai phần Date và Time
+            split_date_time = data['Date'].str.split(' \\| ', expand=True)
+            data[['Date', 'Time']] = split_date_time
 
-# Đường dẫn đến các file dữ liệu
-file_paths = [
-    ('Dollar_Index', 'data//Dollar_Index_history.csv'),
-    ('Dow_Jones', 'data//Dow_Jones_history.csv'),
-    ('FPT', 'data//FPT_history.csv'),
-    ('HPG', 'data//HPG_history.csv'),
-    ('Nasdaq', 'data//Nasdaq_history.csv'),
-    ('US_30', 'data//US_30_history.csv'),
-    ('US_500', 'data//US_500_history.csv'),
-    ('VCB', 'data//VCB_history.csv'),
-    ('VIC', 'data//VIC_history.csv'),
-    ('VNM', 'data//VNM_history.csv')
-]
+            # Chuyển đổi cột Date sang định dạng datetime
+            data['Date'] = pd.to_datetime(data['Date'], format='%b %d, %Y', errors='coerce')
+
+            # Loại bỏ cột Time vì không cần thiết cho phân tích này
+            data.drop(columns=['Time'], inplace=True)
+
+            # Tính toán sentiment scores cho cột Content
+            with instrumentation.span('sentiment', chunk=i) as span:
+                data['sentiment_score'] = scorer.score(data['Content'])
+                span.frame(data)
+
+            # Lưu lại dữ liệu đã tiền xử lý vào tệp CSV mới
+            with instrumentation.span('write', target='articles', chunk=i) as span:
+                data.to_csv(articles_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+                span.frame(data)
+
+    # Hiển thị thông báo hoàn thành
+    print(f"Dữ liệu đã được lưu vào tệp: {articles_path}")
+
+
+def load_dataframes():
+    # Đọc dữ liệu (chỉ mục ngày đã được storage chuẩn hóa)
+    dataframes = {}
+    for name, path in file_paths:
+        with instrumentation.span('load', source=name) as span:
+            df = storage.read_frame(path)
+
+            # Xóa cột Dollar_Index_Volume nếu tồn tại
+            if 'Volume' in df.columns:
+                df.drop(columns=['Volume'], inplace=True)
+            span.frame(df)
 
-# Đọc dữ liệu từ các file CSV
-dataframes = {}
-for name, path in file_paths:
-    df = pd.read_csv(path)
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
-        df.set_index('Date', inplace=True)
+        dataframes[name] = df
+        instrumentation.debug(f"Dataframe {name} after setting datetime index:")
+        instrumentation.debug(df.head())
+    return dataframes
+
+
+def fill_missing_values(df, strategy=None):
+    """Điền giá trị khuyết của mọi cột số trong một lượt trên mảng NumPy.
+
+    strategy: 'mean' (trung bình cột), 'ffill' (giá trị gần nhất trước đó) hoặc 'time'
+    (nội suy tuyến tính theo thời gian). Với 'ffill' và 'time', các giá trị khuyết ở đầu
+    chuỗi lấy giá trị hợp lệ gần nhất. Chỉ các cột có giá trị khuyết được ghi lại.
+    """
+    strategy = strategy or FILL_STRATEGY
+    numeric_cols = df.select_dtypes('number').columns
+    values = df[numeric_cols].to_numpy(dtype=float)
+    missing = np.isnan(values)
+    nan_cols = missing.any(axis=0)
+    if not nan_cols.any():
+        return df
+    values, missing = values[:, nan_cols], missing[:, nan_cols]
+
+    if strategy == 'mean':
+        with np.errstate(invalid='ignore'):
+            means = np.nanmean(values, axis=0)
+        values[missing] = np.take(means, np.nonzero(missing)[1])
+    elif strategy == 'ffill':
+        # Chỉ số dòng hợp lệ gần nhất cho mỗi ô, tính cho mọi cột cùng lúc
+        last_valid = np.maximum.accumulate(np.where(missing, 0, np.arange(len(values))[:, np.newaxis]), axis=0)
+        values = np.take_along_axis(values, last_valid, axis=0)
+        leading = np.isnan(values)
+        if leading.any():
+            first_valid = np.argmax(~missing, axis=0)
+            values[leading] = values[first_valid, np.arange(values.shape[1])][np.nonzero(leading)[1]]
+    elif strategy == 'time':
+        x = df.index.asi8.astype(float) if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df), dtype=float)
+        for j in range(values.shape[1]):
+            valid = ~missing[:, j]
+            if valid.any():
+                values[missing[:, j], j] = np.interp(x[missing[:, j]], x[valid], values[valid, j])
     else:
-        df['time'] = pd.to_datetime(df['time'])
-        df.set_index('time', inplace=True)
-        
-    # Xóa cột Dollar_Index_Volume nếu tồn tại
-    if 'Volume' in df.columns:
-        df.drop(columns=['Volume'], inplace=True)
-    
-    dataframes[name] = df
-    print(f"Dataframe {name} after setting datetime index:")
-    print(df.head())
-
-def fill_missing_values(df):
-    df = df.copy()
-    # Điền các giá trị khuyết bằng trung bình của cột tương ứng
-    for col in df.columns:
-        if df[col].isnull().any():
-            df[col].fillna(df[col].mean(), inplace=True)
+        raise ValueError(f"Chiến lược điền giá trị khuyết không hợp lệ: {strategy}")
+
+    df = df.copy(deep=False)
+    df[numeric_cols[nan_cols]] = values
     return df
 
+
+# Thêm các cột chỉ báo vào dữ liệu gốc; features là danh sách chỉ báo theo định dạng của
+# indicators.py (mặc định là 5 đặc trưng return/ma5/ma10/std_dev/ema10)
+def add_indicators(df, features=indicators.DEFAULT_FEATURES):
+    close_col = feature_store.close_column(df)
+    high_col = 'High' if 'High' in df.columns else 'high'
+    low_col = 'Low' if 'Low' in df.columns else 'low'
+    indicator_df = indicators.indicator_frame(df[close_col], features,
+                                              df.get(high_col), df.get(low_col))
+    # Ghép một lần thay vì sao chép dữ liệu gốc rồi gán từng cột
+    return pd.concat([df, indicator_df], axis=1), list(indicator_df.columns)
+
+
 # Chuyển đổi dữ liệu time-series thành dữ liệu đặc trưng
-def create_features(df, label):
-    df = df.copy()
-    close_col = 'Close' if 'Close' in df.columns else 'close'
-    df['return'] = df[close_col].pct_change()
-    df['ma5'] = df[close_col].rolling(window=5).mean()
-    df['ma10'] = df[close_col].rolling(window=10).mean()
-    df['std_dev'] = df[close_col].rolling(window=10).std()
-    df['ema10'] = df[close_col].ewm(span=10, adjust=False).mean()
-
-    # Điền giá trị khuyết sử dụng phương pháp trung bình động
-    df = fill_missing_values(df)
-
-    # Chuẩn hóa dữ liệu
-    scaler = StandardScaler()
-    feature_cols = ['return', 'ma5', 'ma10', 'std_dev', 'ema10']
-    df.dropna(inplace=True)  # Đảm bảo không có giá trị NA trước khi chuẩn hóa
-    df[feature_cols] = scaler.fit_transform(df[feature_cols])
-    
+def create_features(df, label, scaler=None, features=indicators.DEFAULT_FEATURES):
+    with instrumentation.span('feature_build', source=label) as span:
+        df, feature_cols = add_indicators(df, features)
+        span.frame(df)
+
+    # Điền giá trị khuyết (mặc định bằng trung bình cột, xem FILL_STRATEGY)
+    with instrumentation.span('fill', source=label) as span:
+        df = span.frame(fill_missing_values(df))
+
+    # Chuẩn hóa dữ liệu (scaler truyền vào sẽ được fit tại chỗ để lưu lại tham số)
+    with instrumentation.span('scale', source=label) as span:
+        if scaler is None:
+            scaler = StandardScaler()
+        df = df.dropna()  # Đảm bảo không có giá trị NA trước khi chuẩn hóa
+        df[feature_cols] = scaler.fit_transform(df[feature_cols].to_numpy())
+        span.frame(df)
+
     df.columns = [f"{label}_{col}" for col in df.columns]  # Nhãn hóa tên cột
-    
-    print(f"Features for {label} after creation and normalization:")
-    print(df.head())
-    
+
+    instrumentation.debug(f"Features for {label} after creation and normalization:")
+    instrumentation.debug(df.head())
+
     return df
 
-# Đọc dữ liệu bài báo đã tiền xử lý
-articles_path = 'data//preprocessed_articles_with_sentiment.csv'
-articles_data = pd.read_csv(articles_path)
-articles_data['Date'] = pd.to_datetime(articles_data['Date'])
-articles_data.set_index('Date', inplace=True)
 
-# Kết hợp dữ liệu bài báo với dữ liệu chứng khoán
-stocks = ['FPT', 'HPG', 'VCB', 'VIC', 'VNM']
-indexes = ['Dollar_Index', 'Dow_Jones', 'Nasdaq', 'US_30', 'US_500']
+def load_articles():
+    # Đọc dữ liệu bài báo đã tiền xử lý
+    with instrumentation.span('load', source='articles') as span:
+        articles_data = pd.read_csv(articles_path)
+        articles_data['Date'] = pd.to_datetime(articles_data['Date'])
+        articles_data.set_index('Date', inplace=True)
+        span.frame(articles_data)
+    return articles_data
+
+
+# Tính đặc trưng cho mỗi nguồn dữ liệu đúng một lần để dùng chung cho mọi mã cổ phiếu
+def build_source_features(dataframes, names):
+    source_features = {}
+    scalers = {}
+    for name in names:
+        if name in dataframes:
+            scalers[name] = StandardScaler()
+            source_features[name] = create_features(dataframes[name], name, scalers[name])
+    return source_features, scalers
+
+
+def merge_stock(stock, source_features, articles_data, fill=True):
+    with instrumentation.span('join', stock=stock) as span:
+        merged_df = source_features[stock]
+        for index in indexes:
+            if index in source_features:
+                merged_df = merged_df.join(source_features[index], how='inner')
+
+        # Kết hợp với đặc trưng cảm xúc đã gộp theo phiên (mỗi phiên một dòng)
+        if articles_data is not None:
+            merged_df = merged_df.join(sentiment.aggregate_daily(articles_data, merged_df.index))
+        span.frame(merged_df)
+
+    if not fill:
+        return merged_df
+    # Điền giá trị khuyết (mặc định bằng trung bình cột, xem FILL_STRATEGY)
+    with instrumentation.span('fill', stock=stock) as span:
+        return span.frame(fill_missing_values(merged_df))
+
+
+# Dữ liệu merged chưa điền giá trị khuyết và chưa chuẩn hóa, để đánh giá walk-forward
+# fit imputer/scaler chỉ trên phần huấn luyện của mỗi fold
+def build_raw_datasets(dataframes, articles_data, stock_names=None, features=indicators.DEFAULT_FEATURES):
+    source_features = {}
+    for name in stocks + indexes:
+        if name in dataframes:
+            source_features[name] = add_indicators(dataframes[name], features)[0].add_prefix(f'{name}_')
+    return {stock: merge_stock(stock, source_features, articles_data, fill=False)
+            for stock in (stock_names or stocks)}
+
+
+# Xây dựng lại toàn bộ dữ liệu merged và lưu trạng thái cho chế độ tăng dần
+def build_full(dataframes, articles_data):
+    state = {'sources': {}, 'merged': {}}
+    source_features, scalers = build_source_features(dataframes, stocks + indexes)
+
+    # Lưu đặc trưng và trạng thái cuộn của từng nguồn dữ liệu
+    for name, features_df in source_features.items():
+        with instrumentation.span('write', target='features', source=name) as span:
+            feature_store.write_features(name, features_df)
+            span.frame(features_df)
+        state['sources'][name] = feature_store.source_state(dataframes[name], scalers[name])
+
+    # Kết hợp dữ liệu bài báo với dữ liệu chứng khoán
+    merged = {}
+    for stock in stocks:
+        merged_df = merged[stock] = merge_stock(stock, source_features, articles_data)
+
+        with instrumentation.span('write', target='merged', stock=stock) as span:
+            output_path = storage.write_frame(merged_df, feature_store.merged_path(stock))
+            span.frame(merged_df)
+        state['merged'][stock] = feature_store.merged_state(merged_df)
+        print(f"Data processing complete for {stock}. The merged data has been saved to {output_path}")
+        instrumentation.debug(merged_df.head())  # In một vài hàng đầu tiên của DataFrame đã kết hợp cuối cùng
+
+    write_panel(merged)
+    feature_store.save_state(state)
+
+
+# Chỉ tính và nối thêm các phiên giao dịch mới kể từ lần chạy trước
+def build_incremental(dataframes, articles_data):
+    state = feature_store.load_state()
+    for name in stocks + indexes:
+        with instrumentation.span('feature_build', source=name, mode='incremental') as span:
+            new_features = span.frame(feature_store.update_source(name, dataframes[name], state))
+        if not new_features.empty:
+            with instrumentation.span('write', target='features', source=name) as span:
+                storage.append_frame(span.frame(new_features), feature_store.features_path(name))
+        print(f"{name}: {len(new_features)} phiên mới")
+
+    new_rows = {}
+    for stock in stocks:
+        with instrumentation.span('join', stock=stock, mode='incremental') as span:
+            new_rows[stock] = span.frame(feature_store.update_merged(stock, indexes, articles_data, state))
+        print(f"Đã nối {len(new_rows[stock])} dòng mới vào {feature_store.merged_path(stock)}")
+
+    append_panel(new_rows)
+    feature_store.save_state(state)
+
+
+# Nối các dòng merged mới vào panel; chỉ ghi lại toàn bộ panel khi chưa có hoặc mã/cột đã thay đổi
+def append_panel(new_rows):
+    if panel.exists():
+        try:
+            with instrumentation.span('write', target='panel', mode='incremental') as span:
+                span.set(rows=panel.append(new_rows, shared_sources=indexes))
+            return
+        except ValueError as e:
+            print(f"{e}; ghi lại toàn bộ panel")
+    write_panel({stock: storage.read_frame(feature_store.merged_path(stock)) for stock in stocks})
+
+
+# Ghi dữ liệu merged của mọi mã dưới dạng panel float32 dùng chung cho dashboard và huấn luyện (xem panel.py)
+def write_panel(merged):
+    with instrumentation.span('write', target='panel') as span:
+        merged_panel = panel.Panel.from_merged(merged, indexes)
+        merged_panel.save()
+        span.set(rows=len(merged_panel.stocks), bytes=merged_panel.memory_usage())
+    print(f"Đã lưu panel {len(merged_panel.symbols)} mã vào {panel.PANEL_PATH} "
+          f"({merged_panel.memory_usage() / 2 ** 20:.1f} MB trong bộ nhớ)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiền xử lý dữ liệu chứng khoán và bài báo')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Chỉ tính đặc trưng cho các phiên mới dựa trên trạng thái đã lưu')
+    parser.add_argument('--sentiment-workers', type=int, default=None,
+                        help='Số tiến trình chấm điểm cảm xúc (mặc định: số CPU)')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure_from_args(args)
+
+    score_articles(args.sentiment_workers)
+    dataframes = load_dataframes()
+    articles_data = load_articles()
+
+    if args.incremental and feature_store.has_state(feature_store.load_state(), stocks + indexes, stocks):
+        build_incremental(dataframes, articles_data)
+    else:
+        if args.incremental:
+            print("Chưa có trạng thái đặc trưng, tiến hành xây dựng lại toàn bộ.")
+        build_full(dataframes, articles_data)
+
 
-for stock in stocks:
-    merged_df = create_features(dataframes[stock], stock)
-    for index in indexes:
-        if index in dataframes:
-            features_df = create_features(dataframes[index], index)
-            merged_df = merged_df.join(features_df, how='inner')
-    
-    # Kết hợp với dữ liệu bài báo
-    merged_df = merged_df.join(articles_data['sentiment_score'], how='left')
-    
-    # Điền giá trị khuyết sử dụng phương pháp trung bình động
-    merged_df = fill_missing_values(merged_df)
-
-    output_path = f'data//merged_{stock}_data.csv'
-    merged_df.to_csv(output_path)
-    print(f"Data processing complete for {stock}. The merged data has been saved to {output_path}")
-    print(merged_df.head())  # In một vài hàng đầu tiên của DataFrame đã kết hợp cuối cùng
+if __name__ == '__main__':
+    main()
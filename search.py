@@ -0,0 +1,102 @@
+import time
+
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingGridSearchCV, HalvingRandomSearchCV, cross_validate
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+# Các chiến lược tìm kiếm siêu tham số được hỗ trợ
+SEARCH_ENGINES = ('grid', 'halving', 'halving_random')
+
+# Tỉ lệ giữ lại của mỗi vòng successive halving và số ứng viên tối đa cho halving_random
+HALVING_FACTOR = 3
+MAX_RANDOM_CANDIDATES = 81
+
+# Phần cuối của tập huấn luyện dùng làm tập kiểm định cho early stopping của XGBoost
+VALIDATION_FRACTION = 0.1
+EARLY_STOPPING_ROUNDS = 20
+
+
+def _rows(data, rows):
+    return data.iloc[rows] if hasattr(data, 'iloc') else data[rows]
+
+
+class EarlyStoppingXGBRegressor(XGBRegressor):
+    """XGBRegressor tự tách tập kiểm định để dùng early stopping gốc khi gọi fit.
+
+    Nhờ đó n_estimators chỉ là giới hạn trên và có thể tìm kiếm trong các công cụ
+    của scikit-learn (GridSearchCV, successive halving) mà không cần truyền eval_set.
+    """
+
+    def fit(self, X, y, **kwargs):
+        if self.early_stopping_rounds and 'eval_set' not in kwargs:
+            split = int(len(X) * (1 - VALIDATION_FRACTION))
+            kwargs['eval_set'] = [(_rows(X, slice(split, None)), _rows(y, slice(split, None)))]
+            kwargs.setdefault('verbose', False)
+            X, y = _rows(X, slice(None, split)), _rows(y, slice(None, split))
+        return super().fit(X, y, **kwargs)
+
+
+# Các hằng số ảnh hưởng tới kết quả tìm kiếm, dùng trong khóa cache mô hình (xem model_cache.job_key)
+def config():
+    return {'halving_factor': HALVING_FACTOR, 'max_random_candidates': MAX_RANDOM_CANDIDATES,
+            'validation_fraction': VALIDATION_FRACTION, 'early_stopping_rounds': EARLY_STOPPING_ROUNDS}
+
+
+def early_stopping_xgb(**params):
+    return EarlyStoppingXGBRegressor(objective='reg:squarederror', random_state=42, n_estimators=1000,
+                                     early_stopping_rounds=EARLY_STOPPING_ROUNDS, **params)
+
+
+# Tìm siêu tham số và tính điểm CV cho mọi chỉ số trong scoring.
+# Trả về (best_model, best_params, cv_scores, thông tin lượt tìm kiếm)
+def run_search(model, params, X, y, cv, scoring, refit, engine='grid'):
+    if engine not in SEARCH_ENGINES:
+        raise ValueError(f"Chiến lược tìm kiếm không hợp lệ: {engine}")
+
+    start = time.perf_counter()
+    n_splits = cv.get_n_splits(X, y)
+    if not params:
+        scores = cross_validate(model, X, y, cv=cv, scoring=scoring)
+        cv_scores = {name: scores[f'test_{name}'].mean() for name in scoring}
+        best_model = model
+        best_model.fit(X, y)
+        best_params = model.get_params()
+        n_fits = n_splits + 1
+        engine = 'none'
+    elif engine == 'grid':
+        grid_search = GridSearchCV(estimator=model, param_grid=params, cv=cv, scoring=scoring, refit=refit)
+        grid_search.fit(X, y)
+        best_model = grid_search.best_estimator_
+        best_params = grid_search.best_params_
+        # Dùng lại điểm CV của tổ hợp tốt nhất thay vì fit lại mô hình cho từng chỉ số
+        cv_scores = {name: grid_search.cv_results_[f'mean_test_{name}'][grid_search.best_index_] for name in scoring}
+        n_fits = len(grid_search.cv_results_['params']) * n_splits + 1
+    else:
+        # Successive halving chỉ hỗ trợ một chỉ số, các chỉ số còn lại được tính trong một lượt cross_validate
+        if engine == 'halving':
+            halving_search = HalvingGridSearchCV(estimator=model, param_grid=params, cv=cv, scoring=scoring[refit],
+                                                 factor=HALVING_FACTOR, random_state=42)
+        else:
+            halving_search = HalvingRandomSearchCV(estimator=model, param_distributions=params, cv=cv,
+                                                   scoring=scoring[refit], factor=HALVING_FACTOR,
+                                                   n_candidates=MAX_RANDOM_CANDIDATES, random_state=42)
+        halving_search.fit(X, y)
+        best_model = halving_search.best_estimator_
+        best_params = halving_search.best_params_
+        scores = cross_validate(best_model, X, y, cv=cv, scoring=scoring)
+        cv_scores = {name: scores[f'test_{name}'].mean() for name in scoring}
+        n_fits = sum(halving_search.n_candidates_) * n_splits + 1 + n_splits
+
+    # Với early stopping, số cây thực sự được dùng do tập kiểm định quyết định
+    final, prefix = (best_model[-1], f'{best_model.steps[-1][0]}__') if isinstance(best_model, Pipeline) \
+        else (best_model, '')
+    if isinstance(final, EarlyStoppingXGBRegressor) and final.early_stopping_rounds:
+        best_params = {**best_params, f'{prefix}n_estimators': final.best_iteration + 1}
+
+    search_info = {
+        'Search': engine,
+        'Search_Time_s': time.perf_counter() - start,
+        'Search_Fits': n_fits
+    }
+    return best_model, best_params, cv_scores, search_info
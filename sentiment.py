@@ -0,0 +1,167 @@
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+SCORE_CACHE_PATH = 'data//sentiment_cache.sqlite'
+CHUNK_SIZE = 5000  # Số bài báo đọc vào bộ nhớ mỗi lần
+SHARD_SIZE = 64  # Số bài báo gửi cho một tiến trình con mỗi lần
+
+# Đặc trưng cảm xúc theo phiên giao dịch; sentiment_score là điểm trung bình trong phiên
+SENTIMENT_COLS = ['sentiment_score', 'sentiment_max', 'sentiment_count', 'sentiment_decay']
+DECAY_HALFLIFE = 3  # Số phiên để trọng số của một bài báo giảm một nửa
+
+# Mỗi tiến trình con khởi tạo bộ phân tích VADER một lần
+_analyzer = None
+
+
+def _init_worker():
+    # Import tại đây để các module chỉ dùng phần tổng hợp theo ngày không cần vaderSentiment
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+    global _analyzer
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def _score(text):
+    if _analyzer is None:
+        _init_worker()
+    return _analyzer.polarity_scores(text)['compound']
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ScoreCache:
+    """Cache điểm cảm xúc theo hash nội dung, để bài báo không đổi không phải chấm lại."""
+
+    def __init__(self, path=SCORE_CACHE_PATH):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS scores (content_hash TEXT PRIMARY KEY, score REAL NOT NULL)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def get_many(self, digests):
+        digests = list(set(digests))
+        scores = {}
+        # Giới hạn số tham số của SQLite cho mỗi truy vấn
+        for i in range(0, len(digests), 900):
+            batch = digests[i:i + 900]
+            placeholders = ",".join("?" * len(batch))
+            scores.update(self.conn.execute(
+                f"SELECT content_hash, score FROM scores WHERE content_hash IN ({placeholders})", batch))
+        return scores
+
+    def put_many(self, scores):
+        self.conn.executemany("INSERT OR REPLACE INTO scores (content_hash, score) VALUES (?, ?)", scores.items())
+        self.conn.commit()
+
+
+class SentimentScorer:
+    """Chấm điểm VADER (compound) song song trên nhiều tiến trình, bỏ qua các nội dung đã có trong cache."""
+
+    def __init__(self, workers=None, cache_path=SCORE_CACHE_PATH, shard_size=SHARD_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.cache = ScoreCache(cache_path)
+        self.executor = None
+        if self.workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.cache.close()
+
+    def score(self, texts):
+        texts = pd.Series(texts).fillna('').astype(str)
+        digests = texts.map(text_hash)
+        scores = self.cache.get_many(digests)
+
+        # Chỉ chấm các nội dung chưa có trong cache (mỗi nội dung một lần)
+        missing = {}
+        for digest, text in zip(digests, texts):
+            if digest not in scores and digest not in missing:
+                missing[digest] = text
+        if missing:
+            if self.executor is not None:
+                new_scores = self.executor.map(_score, missing.values(), chunksize=self.shard_size)
+            else:
+                new_scores = map(_score, missing.values())
+            new_scores = dict(zip(missing.keys(), new_scores))
+            self.cache.put_many(new_scores)
+            scores.update(new_scores)
+        return pd.Series([scores[digest] for digest in digests], index=texts.index, dtype=float)
+
+
+def _decay_filter(values, previous):
+    decay = 0.5 ** (1 / DECAY_HALFLIFE)
+    return lfilter([1.0], [1.0, -decay], values, zi=[decay * previous])[0]
+
+
+def aggregate_daily(articles_data, sessions, decay_state=None, previous_session=None):
+    """Gộp điểm cảm xúc của các bài báo thành một dòng cho mỗi phiên giao dịch trong sessions.
+
+    Bài báo vào ngày nghỉ được tính cho phiên kế tiếp; bài báo sau phiên cuối bị bỏ qua. Bài báo
+    trước phiên đầu chỉ được tính nếu sau previous_session (phiên liền trước sessions, nếu biết),
+    hoặc nếu không biết thì sau ngày làm việc liền trước phiên đầu, tức chỉ tin cuối tuần/ngày lễ.
+    sentiment_decay là trung bình có trọng số giảm dần theo số phiên, tiếp tục từ
+    decay_state (tổng điểm, tổng số bài đã giảm dần) của lần chạy trước nếu có.
+    """
+    sessions = pd.DatetimeIndex(sessions)
+    scores = articles_data['sentiment_score'].dropna()
+    scores = scores[scores.index.notna()]
+    if len(sessions):
+        start = pd.Timestamp(previous_session) if previous_session is not None \
+            else sessions[0].normalize() - pd.offsets.BDay(1)
+        scores = scores[scores.index.normalize() > start]
+    positions = sessions.searchsorted(scores.index.normalize(), side='left')
+    in_range = positions < len(sessions)
+
+    daily = scores[in_range].groupby(positions[in_range]).agg(['mean', 'max', 'count', 'sum'])
+    daily = daily.reindex(range(len(sessions)))
+    counts = daily['count'].fillna(0).to_numpy()
+    totals = daily['sum'].fillna(0).to_numpy()
+
+    score_sum, count_sum = decay_state or (0.0, 0.0)
+    decayed_totals = _decay_filter(totals, score_sum)
+    decayed_counts = _decay_filter(counts, count_sum)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        decayed_mean = np.where(decayed_counts > 0, decayed_totals / decayed_counts, np.nan)
+
+    return pd.DataFrame({
+        'sentiment_score': daily['mean'].to_numpy(),
+        'sentiment_max': daily['max'].to_numpy(),
+        'sentiment_count': counts,
+        'sentiment_decay': decayed_mean
+    }, index=sessions)
+
+
+# Trạng thái (tổng điểm, tổng số bài đã giảm dần) tại phiên cuối, dựng lại từ các cột đã gộp.
+# previous là trạng thái mà aggregate_daily đã dùng để tính daily
+def decay_state(daily, previous=None):
+    previous_count = previous[1] if previous else 0.0
+    decayed_counts = _decay_filter(daily['sentiment_count'].to_numpy(dtype=float), previous_count)
+    count_sum = float(decayed_counts[-1]) if len(decayed_counts) else 0.0
+    if count_sum == 0:
+        return [0.0, 0.0]
+    return [float(daily['sentiment_decay'].iloc[-1]) * count_sum, count_sum]
@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import pandas as pd
+
+# Định dạng lưu trữ mặc định (parquet, feather hoặc csv), có thể đổi qua biến môi trường
+DEFAULT_FORMAT = os.environ.get('STOCK_STORAGE_FORMAT', 'parquet')
+EXTENSIONS = {'parquet': '.parquet', 'feather': '.feather', 'csv': '.csv'}
+
+# Tên cột ngày có thể gặp trong các file CSV cũ (crawler cổ phiếu dùng 'time')
+DATE_COLUMNS = ('Date', 'time', 'Unnamed: 0')
+INDEX_NAME = 'Date'
+PARTITION_COL = 'year'
+
+
+def has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_format(fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Định dạng lưu trữ không hợp lệ: {fmt}")
+    # Không có pyarrow thì quay về CSV
+    if fmt != 'csv' and not has_pyarrow():
+        return 'csv'
+    return fmt
+
+
+# Trả về (định dạng, đường dẫn) của bản lưu mới nhất cho một tập dữ liệu
+def locate(path):
+    found = [(fmt, path + ext) for fmt, ext in EXTENSIONS.items() if os.path.exists(path + ext)]
+    if not found:
+        raise FileNotFoundError(f"Không tìm thấy dữ liệu cho {path} ({', '.join(EXTENSIONS.values())})")
+    return max(found, key=lambda item: os.path.getmtime(item[1]))
+
+
+def exists(path):
+    return any(os.path.exists(path + ext) for ext in EXTENSIONS.values())
+
+
+# Thời điểm sửa đổi gần nhất; với Parquet phân vùng, xét cả các file bên trong thư mục
+def mtime(path):
+    target = locate(path)[1]
+    if not os.path.isdir(target):
+        return os.path.getmtime(target)
+    return max(os.path.getmtime(os.path.join(root, name))
+               for root, dirs, files in os.walk(target) for name in dirs + files + ['.'])
+
+
+def _remove(target):
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    elif os.path.exists(target):
+        os.remove(target)
+
+
+def _to_table(df):
+    table = df.copy()
+    table.index.name = INDEX_NAME
+    return table.reset_index()
+
+
+def write_frame(df, path, fmt=None):
+    fmt = resolve_format(fmt)
+    target = path + EXTENSIONS[fmt]
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    _remove(target)
+
+    if fmt == 'parquet':
+        # Phân vùng theo năm để có thể chỉ đọc các năm cần thiết
+        table = _to_table(df)
+        table[PARTITION_COL] = table[INDEX_NAME].dt.year
+        table.to_parquet(target, partition_cols=[PARTITION_COL], index=False)
+    elif fmt == 'feather':
+        _to_table(df).to_feather(target)
+    else:
+        df.to_csv(target, index_label=INDEX_NAME)
+    return target
+
+
+# Nối thêm các dòng mới vào tập dữ liệu đã có (hoặc tạo mới nếu chưa có)
+def append_frame(df, path, fmt=None):
+    if not exists(path):
+        return write_frame(df, path, fmt)
+
+    fmt, target = locate(path)
+    if fmt == 'parquet':
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        schema = ds.dataset(target, format='parquet', partitioning='hive').schema
+        table = _to_table(df)
+        # Cột categorical (dictionary) được ghi lại đúng kiểu nên không cần ép
+        table = table.astype({field.name: field.type.to_pandas_dtype() for field in schema
+                              if field.name in table.columns and field.name != INDEX_NAME
+                              and not pa.types.is_dictionary(field.type)})
+        table[PARTITION_COL] = table[INDEX_NAME].dt.year
+        table.to_parquet(target, partition_cols=[PARTITION_COL], index=False)
+    elif fmt == 'feather':
+        write_frame(pd.concat([read_frame(path), df]), path, fmt)
+    else:
+        df.to_csv(target, mode='a', header=False)
+    return target
+
+
+def read_frame(path, columns=None, start=None, end=None):
+    """Đọc tập dữ liệu với chỉ mục ngày tên 'Date'; columns chỉ đọc các cột được yêu cầu."""
+    fmt, target = locate(path)
+    columns = list(columns) if columns is not None else None
+
+    if fmt == 'parquet':
+        filters = []
+        if start is not None:
+            filters.append((PARTITION_COL, '>=', pd.Timestamp(start).year))
+        if end is not None:
+            filters.append((PARTITION_COL, '<=', pd.Timestamp(end).year))
+        df = pd.read_parquet(target, columns=[INDEX_NAME] + columns if columns is not None else None,
+                             filters=filters or None)
+        df = df.drop(columns=[PARTITION_COL], errors='ignore').set_index(INDEX_NAME)
+    elif fmt == 'feather':
+        df = pd.read_feather(target, columns=[INDEX_NAME] + columns if columns is not None else None)
+        df = df.set_index(INDEX_NAME)
+    else:
+        header = pd.read_csv(target, nrows=0).columns
+        date_col = next((col for col in header if col in DATE_COLUMNS), header[0])
+        df = pd.read_csv(target, usecols=[date_col] + columns if columns is not None else None)
+        df[date_col] = pd.to_datetime(df[date_col])
+        df = df.set_index(date_col)
+        if columns is not None:
+            df = df[columns]
+
+    df.index.name = INDEX_NAME
+    df = df.sort_index(kind='stable')
+    if start is not None or end is not None:
+        df = df.loc[start:end]
+    return df
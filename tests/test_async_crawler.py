@@ -0,0 +1,99 @@
+import asyncio
+import csv
+import os
+import sys
+
+from aiohttp import web
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crawler'))
+
+import async_crawler  # noqa: E402
+
+ARTICLE_IDS = ['a-1', 'a-2', 'a-3']
+
+ARTICLE_PAGE = """
+<html><body>
+  <h1 class="article-detail-title f0">Title {id}</h1>
+  <span class="article-detail-publish">2024-01-0{day}</span>
+  <div id="__MB_MASTERCMS_EL_3"><p>Content of {id}.</p></div>
+</body></html>
+"""
+
+
+# Máy chủ HTTP cục bộ giả lập chủ đề kinh tế: trang danh sách 1 có ba bài và một liên kết ở sidebar,
+# trang 2 không còn bài; bài a-2 trả về 503 ở lần đầu
+class FixtureSite:
+    def __init__(self):
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self.failed_once = set()
+
+    async def listing(self, request):
+        base = f'http://{request.host}'
+        links = ''
+        if request.query.get('BRSR') == '0':
+            links = ''.join(f'<a class="article-image" href="{base}/{article_id}.html"></a>'
+                            for article_id in ARTICLE_IDS)
+        return web.Response(content_type='text/html', text=f"""
+            <html><body>
+              <div class="col-Left lt">{links}</div>
+              <div class="col-Right rt"><a class="article-image" href="{base}/sidebar.html"></a></div>
+            </body></html>""")
+
+    async def article(self, request):
+        article_id = request.match_info['id']
+        self.requests.append(article_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.05)
+            if article_id == 'a-2' and article_id not in self.failed_once:
+                self.failed_once.add(article_id)
+                return web.Response(status=503)
+            return web.Response(content_type='text/html', text=ARTICLE_PAGE.format(
+                id=article_id, day=article_id[-1]))
+        finally:
+            self.in_flight -= 1
+
+
+# Chạy crawler runs lần trên cùng máy chủ; trả về số bài mới của mỗi lần, site.requests chỉ giữ lần cuối
+async def crawl_fixture_site(site, tmp_path, runs=1):
+    app = web.Application()
+    app.router.add_get('/economy', site.listing)
+    app.router.add_get('/{id}.html', site.article)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, '127.0.0.1', 0)
+    await server.start()
+    port = runner.addresses[0][1]
+    totals = []
+    try:
+        for _ in range(runs):
+            site.requests.clear()
+            totals.append(await async_crawler.crawl_articles(
+                2, topic_url=f'http://127.0.0.1:{port}/economy?topic=economy',
+                output_path=str(tmp_path / 'article.csv'), index_path=str(tmp_path / 'crawl_index.sqlite'),
+                requests_per_second=0))
+        return totals
+    finally:
+        await runner.cleanup()
+
+
+def test_crawl_articles_against_fixture_server(tmp_path):
+    site = FixtureSite()
+    assert asyncio.run(crawl_fixture_site(site, tmp_path)) == [3]
+
+    with open(tmp_path / 'article.csv', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert sorted(row[0] for row in rows) == ['Title a-1', 'Title a-2', 'Title a-3']
+    assert all(row[2] == f"Content of {row[0].split()[-1]}." for row in rows)
+    # Các bài được tải đồng thời, a-2 được thử lại sau 503 và liên kết sidebar bị bỏ qua
+    assert site.max_in_flight > 1
+    assert site.requests.count('a-2') == 2
+    assert 'sidebar' not in site.requests
+
+
+def test_crawl_articles_skips_known_articles_on_rerun(tmp_path):
+    site = FixtureSite()
+    assert asyncio.run(crawl_fixture_site(site, tmp_path, runs=2)) == [3, 0]
+    assert site.requests == []
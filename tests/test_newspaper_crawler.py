@@ -0,0 +1,34 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'crawler'))
+
+from newspaper_crawler import parse_listing  # noqa: E402
+
+LISTING_PAGE = """
+<html><body>
+  <div class="col-Left lt">
+    <article><a class="article-image" href="https://vietnamtimes.org.vn/a-1.html"></a></article>
+    <article><a class="article-image" href="https://vietnamtimes.org.vn/a-2.html"></a></article>
+  </div>
+  <div class="col-Right rt">
+    <article><a class="article-image" href="https://vietnamtimes.org.vn/sidebar.html"></a></article>
+  </div>
+</body></html>
+"""
+
+
+def test_parse_listing_ignores_sidebar_links():
+    assert parse_listing(LISTING_PAGE) == ['https://vietnamtimes.org.vn/a-1.html',
+                                           'https://vietnamtimes.org.vn/a-2.html']
+
+
+def test_parse_listing_accepts_wrapper_only():
+    wrapper = LISTING_PAGE.split('<body>')[1].split('<div class="col-Right')[0]
+    assert parse_listing(wrapper) == ['https://vietnamtimes.org.vn/a-1.html',
+                                      'https://vietnamtimes.org.vn/a-2.html']
+
+
+def test_parse_listing_falls_back_to_whole_page():
+    page = '<div><a class="article-image" href="https://vietnamtimes.org.vn/a-3.html"></a></div>'
+    assert parse_listing(page) == ['https://vietnamtimes.org.vn/a-3.html']
@@ -1,30 +1,45 @@
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-from sklearn.model_selection import KFold, cross_val_score, train_test_split, GridSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import KFold, TimeSeriesSplit, train_test_split
 from sklearn.linear_model import LinearRegression, Ridge, Lasso
 from sklearn.ensemble import RandomForestRegressor
 from xgboost import XGBRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.metrics import make_scorer, mean_squared_error, mean_absolute_error, r2_score
+from threadpoolctl import threadpool_limits
+from concurrent.futures import ProcessPoolExecutor
+from joblib import Parallel, delayed
+import argparse
 import os
-import joblib
+from functools import partial
 
-# Tạo thư mục lưu biểu đồ và mô hình nếu chưa tồn tại
+import numpy as np
+
+import instrumentation
+import model_bundle
+import model_cache
+import panel
+import search
+import storage
+import walk_forward
+
+# Thư mục lưu biểu đồ và mô hình
 output_folder = 'resources'
 model_folder = 'models'
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-if not os.path.exists(model_folder):
-    os.makedirs(model_folder)
-
-# Tải dữ liệu
-datasets = {
-    'FPT': pd.read_csv('data/merged_FPT_data.csv'),
-    'HPG': pd.read_csv('data/merged_HPG_data.csv'),
-    'VCB': pd.read_csv('data/merged_VCB_data.csv'),
-    'VIC': pd.read_csv('data/merged_VIC_data.csv'),
-    'VNM': pd.read_csv('data/merged_VNM_data.csv')
-}
+
+# Các bộ dữ liệu cần huấn luyện
+dataset_names = ['FPT', 'HPG', 'VCB', 'VIC', 'VNM']
+
+# Chế độ huấn luyện chung (--pooled): số mã được đọc từ panel và ghi vào ma trận huấn luyện mỗi lượt
+POOLED_BATCH_SYMBOLS = 50
+POOLED_TARGET = 'close'
+# Cột chứa số thứ tự của mã trong ma trận huấn luyện chung; chỉ được mã hóa one-hot bên trong mô hình
+POOLED_SYMBOL_COL = 'symbol_code'
 
 # Cấu hình tinh chỉnh mô hình
 tuning_params = {
@@ -42,40 +57,34 @@ models = {
     'XGBoost Regressor': XGBRegressor(objective='reg:squarederror', random_state=42)
 }
 
-# Hàm tinh chỉnh và đánh giá mô hình
-def tune_and_evaluate(X, y, model, params):
-    kf = KFold(n_splits=10, shuffle=True, random_state=42)
-    best_params = {}
-    if params:
-        grid_search = GridSearchCV(estimator=model, param_grid=params, cv=kf, scoring='neg_mean_squared_error')
-        grid_search.fit(X, y)
-        best_model = grid_search.best_estimator_
-        best_params = grid_search.best_params_
-    else:
-        best_model = model
-        best_model.fit(X, y)
-        best_params = model.get_params()
-    
-    # Cross-validation scores
-    cv_results = {
-        'neg_mean_squared_error': -cross_val_score(best_model, X, y, cv=kf, scoring='neg_mean_squared_error').mean(),
-        'neg_mean_absolute_error': -cross_val_score(best_model, X, y, cv=kf, scoring='neg_mean_absolute_error').mean(),
-        'r2': cross_val_score(best_model, X, y, cv=kf, scoring='r2').mean()
-    }
-    
-    # Calculate additional metrics
-    cv_rmse = (cv_results['neg_mean_squared_error'])**0.5
-    cv_mae = cv_results['neg_mean_absolute_error']
-    cv_mse = cv_results['neg_mean_squared_error']
-    cv_r2 = cv_results['r2']
+# Chiến lược tìm kiếm siêu tham số cho từng mô hình: 'grid', 'halving' hoặc 'halving_random'
+search_engines = {
+    'Ridge Regression': 'grid',
+    'Lasso Regression': 'grid',
+    'Random Forest Regressor': 'grid',
+    'XGBoost Regressor': 'grid'
+}
+
+# Không gian tìm kiếm rộng hơn cho 'halving_random'
+random_search_params = {
+    'Random Forest Regressor': {'n_estimators': [100, 200, 400], 'max_depth': [None, 10, 20, 30],
+                                'min_samples_leaf': [1, 2, 4], 'max_features': [0.3, 0.5, 1.0]},
+    # n_estimators do early stopping quyết định nên không cần tìm kiếm
+    'XGBoost Regressor': {'max_depth': [3, 4, 5, 6, 8, 10], 'learning_rate': [0.01, 0.03, 0.05, 0.1, 0.2],
+                          'subsample': [0.6, 0.8, 1.0], 'colsample_bytree': [0.5, 0.7, 0.9, 1.0],
+                          'min_child_weight': [1, 3, 5, 10]}
+}
+random_search_models = {
+    'XGBoost Regressor': search.early_stopping_xgb()
+}
 
-    return best_model, cv_rmse, cv_mae, cv_mse, cv_r2, best_params
 
-# Ánh xạ mô hình vào bộ datasets
-results = []
-for dataset_name, data in datasets.items():
-    if 'Unnamed: 0' in data.columns:
-        data.drop(columns=['Unnamed: 0'], inplace=True)
+def load_dataset(dataset_name):
+    with instrumentation.span('load', dataset=dataset_name) as span:
+        return span.frame(storage.read_frame(f'data/merged_{dataset_name}_data'))
+
+
+def prepare_dataset(data):
     target_column = [col for col in data.columns if 'close' in col.lower()][0]
     X = data.drop(columns=[target_column])
     y = data[target_column]
@@ -87,55 +96,481 @@ for dataset_name, data in datasets.items():
     scaler = StandardScaler()
     X_train_scaled = scaler.fit_transform(X_train)
     X_test_scaled = scaler.transform(X_test)
-    
-    for model_name, model in models.items():
-        params = tuning_params.get(model_name, {})
-        best_model, cv_rmse, cv_mae, cv_mse, cv_r2, best_params = tune_and_evaluate(X_train_scaled, y_train, model, params)
-
-        # Lưu kết quả và dự đoán
-        y_pred = best_model.predict(X_test_scaled)
-
-        # Lưu kết quả trực quan hóa
-        plt.figure()
-        plt.plot(y_test.values, label='Thực tế')
-        plt.plot(y_pred, label='Dự đoán', linestyle='dashed')
-        plt.xlabel('Ngày')
-        plt.ylabel('Giá cổ phiếu')
-        plt.title(f'{model_name} Dự đoán vs Thực tế - {dataset_name}')
-        plt.legend()
-        plt.savefig(os.path.join(output_folder, f'{model_name}_{dataset_name}_pred_vs_actual.png'))
-        plt.close()
+    return X_train_scaled, X_test_scaled, y_train, y_test, scaler
+
+
+# Các chỉ số đánh giá chéo, tính trong cùng một lượt với tìm kiếm siêu tham số
+scoring = {
+    'neg_mean_squared_error': 'neg_mean_squared_error',
+    'neg_mean_absolute_error': 'neg_mean_absolute_error',
+    'r2': 'r2'
+}
+REFIT_METRIC = 'neg_mean_squared_error'
+
+
+# Cách chia đánh giá chéo khi tìm siêu tham số (KFold trộn ngẫu nhiên, 10 fold)
+def cv_splitter():
+    return KFold(n_splits=10, shuffle=True, random_state=42)
+
+
+# Cấu hình đánh giá chéo và tìm kiếm đưa vào khóa cache mô hình: đổi bất kỳ giá trị nào
+# cũng khiến các mô hình được huấn luyện lại
+def search_config():
+    return (repr(cv_splitter()), scoring, REFIT_METRIC, search.config())
+
+
+# Hàm tinh chỉnh và đánh giá mô hình
+def tune_and_evaluate(X, y, model, params, engine='grid'):
+    kf = cv_splitter()
+    best_model, best_params, cv_scores, search_info = search.run_search(
+        model, params, X, y, kf, scoring, refit=REFIT_METRIC, engine=engine)
+
+    # Cross-validation scores
+    cv_results = {
+        'neg_mean_squared_error': -cv_scores['neg_mean_squared_error'],
+        'neg_mean_absolute_error': -cv_scores['neg_mean_absolute_error'],
+        'r2': cv_scores['r2']
+    }
+
+    # Calculate additional metrics
+    cv_rmse = (cv_results['neg_mean_squared_error'])**0.5
+    cv_mae = cv_results['neg_mean_absolute_error']
+    cv_mse = cv_results['neg_mean_squared_error']
+    cv_r2 = cv_results['r2']
+
+    return best_model, cv_rmse, cv_mae, cv_mse, cv_r2, best_params, search_info
+
+
+# Chọn mô hình và không gian tham số theo chiến lược tìm kiếm của từng mô hình
+def configure_model(model_name, engine=None, n_threads=None):
+    engine = engine or search_engines.get(model_name, 'grid')
+    model = clone(models[model_name])
+    params = tuning_params.get(model_name, {})
+    if engine == 'halving_random' and model_name in random_search_params:
+        model = clone(random_search_models.get(model_name, model))
+        params = random_search_params[model_name]
+    if n_threads is not None and 'n_jobs' in model.get_params():
+        model.set_params(n_jobs=n_threads)
+    return model, params, engine
+
+
+# Trả lại n_jobs cấu hình gốc cho mô hình đã huấn luyện với giới hạn luồng của tiến trình song song,
+# để Best_Params và bundle được lưu giống hệt khi chạy tuần tự (mô hình phục vụ không bị giới hạn luồng)
+def restore_threads(model_name, engine, best_model, best_params):
+    if 'n_jobs' not in best_model.get_params():
+        return best_params
+    n_jobs = configure_model(model_name, engine)[0].get_params()['n_jobs']
+    best_model.set_params(n_jobs=n_jobs)
+    return {**best_params, 'n_jobs': n_jobs} if 'n_jobs' in best_params else best_params
+
+
+# Lưu biểu đồ giá thực tế và dự đoán trên tập kiểm tra
+def plot_predictions(y_true, y_pred, title, file_name):
+    plt.figure()
+    plt.plot(y_true, label='Thực tế')
+    plt.plot(y_pred, label='Dự đoán', linestyle='dashed')
+    plt.xlabel('Ngày')
+    plt.ylabel('Giá cổ phiếu')
+    plt.title(title)
+    plt.legend()
+    plt.savefig(os.path.join(output_folder, file_name))
+    plt.close()
+
+
+# Lưu bundle vào cache mô hình rồi đặt tại model_path; khi tắt cache (cache_dir=None) thì ghi thẳng
+def save_model(bundle, model_path, key, result, cache_dir):
+    if cache_dir is None:
+        model_bundle.save_bundle(bundle, model_path)
+        return
+    model_cache.store(key, bundle, result, cache_dir)
+    model_cache.publish(key, model_path, cache_dir)
+
+
+# Huấn luyện một cặp (dataset, mô hình); n_threads giới hạn số luồng bên trong để
+# các tiến trình song song không tranh chấp CPU (RandomForest/XGBoost/BLAS).
+# Khi dữ liệu, cột đặc trưng, mô hình và không gian tham số không đổi so với một lần chạy trước,
+# mô hình và kết quả được lấy lại từ cache thay vì huấn luyện lại
+def run_job(dataset_name, model_name, prepared, n_threads=None, engine=None, cache_dir=model_cache.MODEL_CACHE_DIR):
+    X_train_scaled, X_test_scaled, y_train, y_test, scaler = prepared
+    model, params, engine = configure_model(model_name, engine, n_threads)
+    model_path = os.path.join(model_folder, f'{model_name}_{dataset_name}_tuned.joblib')
+    key = model_cache.job_key((X_train_scaled, X_test_scaled, y_train.to_numpy(), y_test.to_numpy()),
+                              scaler.feature_names_in_, model, params, engine, extra=search_config())
+    cached = model_cache.load(key, cache_dir) if cache_dir else None
+
+    if cached is not None:
+        model_cache.publish(key, model_path, cache_dir)
+        result, y_pred = cached['result'], cached['y_pred']
+    else:
+        with threadpool_limits(limits=n_threads):
+            with instrumentation.span('fit', dataset=dataset_name, model=model_name, engine=engine) as span:
+                best_model, cv_rmse, cv_mae, cv_mse, cv_r2, best_params, search_info = tune_and_evaluate(
+                    X_train_scaled, y_train, model, params, engine)
+                span.frame(X_train_scaled)
+            best_params = restore_threads(model_name, engine, best_model, best_params)
 
-        results.append({
+            # Lưu kết quả và dự đoán
+            with instrumentation.span('predict', dataset=dataset_name, model=model_name) as span:
+                y_pred = best_model.predict(span.frame(X_test_scaled))
+
+        result = {
             'Dataset': dataset_name,
             'Model': model_name,
+            'Training_Mode': 'per_symbol',
             'CV_RMSE': cv_rmse,
             'CV_MAE': cv_mae,
             'CV_MSE': cv_mse,
             'CV_R^2': cv_r2,
-            'Best_Params': best_params
-        })
-        
-        # Save the tuned model
-        joblib.dump(best_model, os.path.join(model_folder, f'{model_name}_{dataset_name}_tuned.joblib'))
-
-# Chuyển kết quả thành DataFrame
-results_df = pd.DataFrame(results)
-print(results_df)
-
-# Lưu kết quả vào CSV
-results_df.to_csv('model_comparison_results.csv', index=False)
-
-# Tạo biểu đồ so sánh các chỉ số hiệu suất
-metrics = ['CV_RMSE', 'CV_MAE', 'CV_MSE', 'CV_R^2']
-for metric in metrics:
-    plt.figure(figsize=(10, 6))
-    for model_name in models.keys():
-        subset = results_df[results_df['Model'] == model_name]
-        plt.bar(subset['Dataset'], subset[metric], label=model_name)
-    plt.xlabel('Dataset')
-    plt.ylabel(metric)
-    plt.title(f'So sánh {metric} giữa các mô hình')
-    plt.legend()
-    plt.savefig(os.path.join(output_folder, f'Comparison_{metric}.png'))
-    plt.close()
+            'Best_Params': best_params,
+            **search_info
+        }
+        # Lưu mô hình cùng scaler đã fit trên tập huấn luyện và thứ tự cột đặc trưng
+        bundle = model_bundle.make_bundle(scaler, best_model, scaler.feature_names_in_, y_train.name,
+                                          symbol=dataset_name, model_name=model_name, cache_key=key)
+        save_model(bundle, model_path, key, {'result': result, 'y_pred': y_pred}, cache_dir)
+
+    # Lưu kết quả trực quan hóa
+    plot_predictions(y_test.values, y_pred, f'{model_name} Dự đoán vs Thực tế - {dataset_name}',
+                     f'{model_name}_{dataset_name}_pred_vs_actual.png')
+    return {**result, 'Cache_Hit': cached is not None}
+
+
+# Chạy các công việc, tuần tự hoặc trên một pool tiến trình; mỗi công việc là một hàm nhận
+# n_threads và engine
+def map_jobs(jobs, workers=1, engine=None):
+    if workers <= 1:
+        return [job(engine=engine) for job in jobs]
+
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(job, n_threads=n_threads, engine=engine) for job in jobs]
+        # Giữ nguyên thứ tự kết quả như khi chạy tuần tự
+        return [future.result() for future in futures]
+
+
+# Chạy tất cả các cặp (dataset, mô hình), tuần tự hoặc trên một pool tiến trình
+def run_jobs(prepared_datasets, workers=1, engine=None, cache_dir=model_cache.MODEL_CACHE_DIR):
+    return map_jobs([partial(run_job, dataset_name, model_name, prepared_datasets[dataset_name], cache_dir=cache_dir)
+                     for dataset_name in prepared_datasets for model_name in models], workers, engine)
+
+
+def load_panel(symbols=dataset_names):
+    if panel.exists():
+        return panel.Panel.load()
+    return panel.Panel.from_merged({name: load_dataset(name) for name in symbols})
+
+
+# Dữ liệu huấn luyện chung cho mọi mã: đặc trưng riêng của mã (không tiền tố), đặc trưng chỉ số,
+# cảm xúc và số thứ tự của mã (POOLED_SYMBOL_COL). Các mã được đọc từ panel theo lô batch_size mã và ghi
+# thẳng vào ma trận float32 cấp phát trước; scaler được fit dần bằng partial_fit và không chuẩn hóa cột mã.
+# Mỗi mã được chia train/test như prepare_dataset nên tập kiểm tra của từng mã giống hệt chế độ một mô hình
+# cho mỗi mã
+def prepare_pooled_dataset(merged_panel, symbols=None, batch_size=POOLED_BATCH_SYMBOLS):
+    symbols = list(symbols or merged_panel.symbols)
+    value_cols = [col for col in merged_panel.prefixed if col != POOLED_TARGET]
+    feature_columns = value_cols + list(merged_panel.shared.columns) + merged_panel.unprefixed + [POOLED_SYMBOL_COL]
+    splits = {symbol: train_test_split(np.arange(len(merged_panel.rows(symbol))), test_size=0.2, random_state=42)
+              for symbol in symbols}
+    n_train = sum(len(train) for train, _ in splits.values())
+    n_test = sum(len(test) for _, test in splits.values())
+    X_train = np.zeros((n_train, len(feature_columns)), dtype=np.float32)
+    X_test = np.zeros((n_test, len(feature_columns)), dtype=np.float32)
+    y_train, y_test = np.empty(n_train, dtype=np.float32), np.empty(n_test, dtype=np.float32)
+    groups_train, groups_test = np.empty(n_train, dtype=object), np.empty(n_test, dtype=object)
+    n_values = len(feature_columns) - 1
+
+    scaler = StandardScaler()
+    train_pos = test_pos = 0
+    for start in range(0, len(symbols), batch_size):
+        batch = symbols[start:start + batch_size]
+        with instrumentation.span('pooled_batch', first_symbol=batch[0]) as span:
+            long_df = merged_panel.long_frame(batch)
+            values = long_df[feature_columns[:n_values]].to_numpy(dtype=np.float32)
+            target = long_df[POOLED_TARGET].to_numpy(dtype=np.float32)
+            offset = 0
+            batch_start = train_pos
+            for i, symbol in enumerate(batch):
+                train, test = splits[symbol]
+                for idx, X, y, groups, pos in ((train, X_train, y_train, groups_train, train_pos),
+                                               (test, X_test, y_test, groups_test, test_pos)):
+                    X[pos:pos + len(idx), :n_values] = values[offset + idx]
+                    X[pos:pos + len(idx), n_values] = start + i
+                    y[pos:pos + len(idx)] = target[offset + idx]
+                    groups[pos:pos + len(idx)] = symbol
+                train_pos += len(train)
+                test_pos += len(test)
+                offset += len(train) + len(test)
+            scaler.partial_fit(X_train[batch_start:train_pos])
+            span.set(rows=len(long_df), cols=len(feature_columns))
+
+    # Giữ nguyên số thứ tự của mã để bộ mã hóa one-hot trong mô hình nhận đúng giá trị
+    scaler.mean_[n_values], scaler.var_[n_values], scaler.scale_[n_values] = 0, 1, 1
+    # Chuẩn hóa tại chỗ theo từng khối để không tạo bản sao float64 của cả ma trận
+    for X in (X_train, X_test):
+        for start in range(0, len(X), 100_000):
+            X[start:start + 100_000] = scaler.transform(X[start:start + 100_000])
+    # Để pipeline trong bundle nhận DataFrame theo tên cột như các mô hình riêng từng mã
+    scaler.feature_names_in_ = np.array(feature_columns, dtype=object)
+    return {
+        'X_train': X_train, 'X_test': X_test,
+        'y_train': pd.Series(y_train, name=POOLED_TARGET), 'y_test': pd.Series(y_test, name=POOLED_TARGET),
+        'groups_train': groups_train, 'groups_test': groups_test,
+        'scaler': scaler, 'feature_columns': feature_columns, 'symbols': symbols
+    }
+
+
+# Mô hình chung: cột mã được mã hóa one-hot (không chuẩn hóa) trước estimator. Đầu ra là ma trận thưa khi
+# phần one-hot chiếm đa số (nhiều mã), nên bộ nhớ không tăng theo số mã x số dòng
+def pooled_model(model, n_symbols, symbol_idx):
+    encoder = ColumnTransformer(
+        [('symbol', OneHotEncoder(categories=[np.arange(n_symbols, dtype=np.float32)], dtype=np.float32),
+          [symbol_idx])],
+        remainder='passthrough', sparse_threshold=0.3)
+    return Pipeline([('encode', encoder), ('model', model)])
+
+
+class SymbolMetrics:
+    """Chỉ số MSE/MAE/R^2 của mọi mã trên một fold, tính một lần bằng bincount.
+
+    Các scorer của từng mã trong cùng một pooled_scoring dùng chung một đối tượng; scikit-learn truyền
+    cùng mảng dự đoán của fold cho mọi scorer nên kết quả của lần gọi gần nhất được giữ lại (kèm tham chiếu
+    tới y_true, y_pred) và chỉ tính lại khi sang fold khác.
+    """
+
+    def __init__(self, codes, n_symbols):
+        self.codes = codes
+        self.n_symbols = n_symbols
+        self._inputs = (None, None)
+        self._metrics = None
+
+    def __call__(self, y_true, y_pred):
+        if self._inputs[0] is not y_true or self._inputs[1] is not y_pred:
+            self._metrics = self.compute(y_true, y_pred)
+            self._inputs = (y_true, y_pred)
+        return self._metrics
+
+    def compute(self, y_true, y_pred):
+        groups = self.codes[y_true.index]
+        y = y_true.to_numpy(dtype=float)
+        error = y_pred - y
+        count = np.bincount(groups, minlength=self.n_symbols)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.bincount(groups, y, self.n_symbols) / count
+            sse = np.bincount(groups, error ** 2, self.n_symbols)
+            sst = np.bincount(groups, (y - mean[groups]) ** 2, self.n_symbols)
+            metrics = {'mse': sse / count, 'mae': np.bincount(groups, np.abs(error), self.n_symbols) / count,
+                       'r2': np.where(sst > 0, 1 - sse / sst, np.nan)}
+        # Mã có quá ít dòng trong fold (ví dụ khi successive halving lấy mẫu con) không có chỉ số
+        for values in metrics.values():
+            values[count < 2] = np.nan
+        return metrics
+
+
+def _symbol_score(y_true, y_pred, symbol_metrics, metric, code):
+    return symbol_metrics(y_true, y_pred)[metric][code]
+
+
+# Thêm chỉ số của từng mã ('<chỉ số>_<mã>') vào scoring để lấy chỉ số CV của từng mã ngay từ các fold của
+# lượt tìm kiếm (trung bình qua các fold như chế độ riêng từng mã) thay vì fit thêm. y_true giữ chỉ mục
+# dòng của tập huấn luyện nên codes cho biết mã của từng dòng
+def pooled_scoring(codes, symbols):
+    metrics = {'neg_mean_squared_error': ('mse', False), 'neg_mean_absolute_error': ('mae', False),
+               'r2': ('r2', True)}
+    symbol_metrics = SymbolMetrics(codes, len(symbols))
+    return {**scoring, **{
+        f'{name}_{symbol}': make_scorer(_symbol_score, greater_is_better=greater, symbol_metrics=symbol_metrics,
+                                        metric=metric, code=code)
+        for code, symbol in enumerate(symbols) for name, (metric, greater) in metrics.items()}}
+
+
+# Một mô hình cho mọi mã. Chỉ số CV của từng mã lấy từ các fold của chính lượt tìm kiếm (cùng KFold với
+# tune_and_evaluate), để so sánh trực tiếp với các mô hình riêng từng mã mà không cần fit thêm
+def run_pooled_job(model_name, pooled, n_threads=None, engine=None, cache_dir=model_cache.MODEL_CACHE_DIR):
+    model, params, engine = configure_model(model_name, engine, n_threads)
+    X_train, y_train = pooled['X_train'], pooled['y_train']
+    symbol_idx = pooled['feature_columns'].index(POOLED_SYMBOL_COL)
+    model_path = os.path.join(model_folder, f'{model_name}_pooled_tuned.joblib')
+    key = model_cache.job_key((X_train, pooled['X_test'], y_train.to_numpy(), pooled['y_test'].to_numpy(),
+                               pooled['groups_train'].astype(str)),
+                              pooled['feature_columns'], model, params, engine,
+                              extra=('pooled', pooled['symbols'], search_config()))
+    cached = model_cache.load(key, cache_dir) if cache_dir else None
+
+    if cached is not None:
+        model_cache.publish(key, model_path, cache_dir)
+        results, y_pred = cached['result'], cached['y_pred']
+    else:
+        with threadpool_limits(limits=n_threads):
+            with instrumentation.span('fit', dataset='pooled', model=model_name, engine=engine) as span:
+                best_model, best_params, cv_scores, search_info = search.run_search(
+                    pooled_model(model, len(pooled['symbols']), symbol_idx),
+                    {f'model__{name}': values for name, values in params.items()}, X_train, y_train, cv_splitter(),
+                    pooled_scoring(X_train[:, symbol_idx].astype(int), pooled['symbols']),
+                    refit=REFIT_METRIC, engine=engine)
+                span.frame(X_train)
+            with instrumentation.span('predict', dataset='pooled', model=model_name) as span:
+                y_pred = best_model.predict(span.frame(pooled['X_test']))
+        best_params = {name[len('model__'):]: value for name, value in best_params.items()
+                       if name.startswith('model__')}
+        best_params = restore_threads(model_name, engine, best_model[-1], best_params)
+        print(f"{model_name} (pooled): CV_RMSE={(-cv_scores['neg_mean_squared_error']) ** 0.5:.4f}, "
+              f"CV_R^2={cv_scores['r2']:.4f}")
+
+        results = []
+        for symbol in pooled['symbols']:
+            symbol_mse = -cv_scores[f'neg_mean_squared_error_{symbol}']
+            results.append({
+                'Dataset': symbol,
+                'Model': model_name,
+                'Training_Mode': 'pooled',
+                'CV_RMSE': symbol_mse ** 0.5,
+                'CV_MAE': -cv_scores[f'neg_mean_absolute_error_{symbol}'],
+                'CV_MSE': symbol_mse,
+                'CV_R^2': cv_scores[f'r2_{symbol}'],
+                'Best_Params': best_params,
+                **search_info
+            })
+        bundle = model_bundle.make_bundle(pooled['scaler'], best_model, pooled['feature_columns'], POOLED_TARGET,
+                                          symbols=pooled['symbols'], symbol_column=POOLED_SYMBOL_COL,
+                                          model_name=model_name, training_mode='pooled', cache_key=key)
+        save_model(bundle, model_path, key, {'result': results, 'y_pred': y_pred}, cache_dir)
+
+    for symbol in pooled['symbols']:
+        test_rows = pooled['groups_test'] == symbol
+        plot_predictions(pooled['y_test'][test_rows].values, y_pred[test_rows],
+                         f'{model_name} (pooled) Dự đoán vs Thực tế - {symbol}',
+                         f'{model_name}_{symbol}_pooled_pred_vs_actual.png')
+    return [{**row, 'Cache_Hit': cached is not None} for row in results]
+
+
+def run_pooled_jobs(pooled, workers=1, engine=None, cache_dir=model_cache.MODEL_CACHE_DIR):
+    results = map_jobs([partial(run_pooled_job, model_name, pooled, cache_dir=cache_dir) for model_name in models],
+                       workers, engine)
+    return [row for rows in results for row in rows]
+
+
+# Huấn luyện và đánh giá một mô hình trên một fold walk-forward. Với tune=True, siêu tham số được
+# chọn bằng TimeSeriesSplit chỉ trên phần huấn luyện của fold
+def run_walk_forward_job(dataset_name, model_name, fold_index, fold, n_threads=None, engine=None, tune=False):
+    model, params, engine = configure_model(model_name, engine, n_threads)
+    labels = {'dataset': dataset_name, 'model': model_name, 'fold': fold_index}
+    with threadpool_limits(limits=n_threads):
+        with instrumentation.span('fit', tune=tune, **labels) as span:
+            if tune:
+                inner_cv = TimeSeriesSplit(n_splits=walk_forward.INNER_SPLITS)
+                model, best_params, _, _ = search.run_search(
+                    model, params, fold['X_train'], fold['y_train'], inner_cv, scoring,
+                    refit='neg_mean_squared_error', engine=engine)
+            else:
+                model.fit(fold['X_train'], fold['y_train'])
+                best_params = {}
+            best_params = restore_threads(model_name, engine, model, best_params)
+            span.frame(fold['X_train'])
+        with instrumentation.span('predict', **labels) as span:
+            y_pred = model.predict(span.frame(fold['X_test']))
+
+    return {
+        'Dataset': dataset_name,
+        'Model': model_name,
+        'Fold': fold_index,
+        'Train_Start': fold['train_start'],
+        'Train_End': fold['train_end'],
+        'Test_Start': fold['test_start'],
+        'Test_End': fold['test_end'],
+        **walk_forward.evaluate(fold['y_test'], y_pred),
+        'Best_Params': best_params
+    }
+
+
+# Backtest cửa sổ mở rộng cho mọi cặp (dataset, mô hình); các fold chạy song song trên workers tiến trình
+def run_walk_forward(raw_datasets, workers=1, engine=None, tune=False, n_splits=walk_forward.WF_SPLITS):
+    folds = {name: walk_forward.load_folds(name, data, n_splits) for name, data in raw_datasets.items()}
+    n_threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+    results = Parallel(n_jobs=workers)(
+        delayed(run_walk_forward_job)(dataset_name, model_name, i, fold, n_threads, engine, tune)
+        for dataset_name in folds for model_name in models for i, fold in enumerate(folds[dataset_name]))
+    return pd.DataFrame(results)
+
+
+def load_raw_datasets():
+    import pre_processing
+
+    articles = pre_processing.load_articles() if os.path.exists(pre_processing.articles_path) else None
+    return pre_processing.build_raw_datasets(pre_processing.load_dataframes(), articles, dataset_names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Huấn luyện và tinh chỉnh các mô hình dự đoán giá cổ phiếu')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Số tiến trình huấn luyện song song các cặp (dataset, mô hình)')
+    parser.add_argument('--search', choices=search.SEARCH_ENGINES, default=None,
+                        help='Dùng một chiến lược tìm kiếm cho mọi mô hình thay cho cấu hình search_engines')
+    parser.add_argument('--walk-forward', action='store_true',
+                        help='Đánh giá bằng backtest cửa sổ mở rộng theo thời gian thay vì chia ngẫu nhiên')
+    parser.add_argument('--wf-splits', type=int, default=walk_forward.WF_SPLITS,
+                        help='Số fold của backtest walk-forward')
+    parser.add_argument('--wf-tune', action='store_true',
+                        help='Tìm siêu tham số bên trong mỗi fold walk-forward (chậm hơn)')
+    parser.add_argument('--pooled', action='store_true',
+                        help='Huấn luyện thêm một mô hình chung cho mọi mã với mỗi thuật toán và so sánh '
+                             'với các mô hình riêng từng mã')
+    parser.add_argument('--pooled-only', action='store_true',
+                        help='Chỉ huấn luyện các mô hình chung (bỏ qua mô hình riêng từng mã)')
+    parser.add_argument('--no-model-cache', action='store_true',
+                        help='Huấn luyện lại mọi mô hình, không dùng và không ghi cache mô hình')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.configure_from_args(args)
+
+    if args.walk_forward:
+        fold_results = run_walk_forward(load_raw_datasets(), args.workers, args.search, args.wf_tune, args.wf_splits)
+        summary = walk_forward.summarize(fold_results)
+        print(summary)
+        fold_results.to_csv('walk_forward_folds.csv', index=False)
+        summary.to_csv('walk_forward_results.csv', index=False)
+        return
+
+    # Tạo thư mục lưu biểu đồ và mô hình nếu chưa tồn tại
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    if not os.path.exists(model_folder):
+        os.makedirs(model_folder)
+
+    cache_dir = None if args.no_model_cache else model_cache.MODEL_CACHE_DIR
+    results = []
+    if not args.pooled_only:
+        # Tải và chuẩn bị dữ liệu
+        prepared_datasets = {name: prepare_dataset(load_dataset(name)) for name in dataset_names}
+        results += run_jobs(prepared_datasets, args.workers, args.search, cache_dir)
+    if args.pooled or args.pooled_only:
+        pooled = prepare_pooled_dataset(load_panel(), dataset_names)
+        results += run_pooled_jobs(pooled, args.workers, args.search, cache_dir)
+    if cache_dir is not None:
+        n_hits = sum(result['Cache_Hit'] for result in results)
+        print(f"Dùng lại {n_hits}/{len(results)} kết quả từ cache mô hình; "
+              f"đã xóa {model_cache.prune(cache_dir)} mục cache cũ")
+
+    # Chuyển kết quả thành DataFrame
+    results_df = pd.DataFrame(results)
+    print(results_df)
+
+    # Lưu kết quả vào CSV
+    results_df.to_csv('model_comparison_results.csv', index=False)
+
+    # Tạo biểu đồ so sánh các chỉ số hiệu suất
+    metrics = ['CV_RMSE', 'CV_MAE', 'CV_MSE', 'CV_R^2']
+    for metric in metrics:
+        plt.figure(figsize=(10, 6))
+        for (model_name, mode), subset in results_df.groupby(['Model', 'Training_Mode'], sort=False):
+            label = model_name if mode == 'per_symbol' else f'{model_name} ({mode})'
+            plt.bar(subset['Dataset'], subset[metric], label=label)
+        plt.xlabel('Dataset')
+        plt.ylabel(metric)
+        plt.title(f'So sánh {metric} giữa các mô hình')
+        plt.legend()
+        plt.savefig(os.path.join(output_folder, f'Comparison_{metric}.png'))
+        plt.close()
+
+
+if __name__ == '__main__':
+    main()
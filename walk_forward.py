@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+# Số fold của backtest cửa sổ mở rộng và số phiên bỏ trống giữa tập huấn luyện và tập kiểm tra
+WF_SPLITS = 5
+WF_GAP = 0
+INNER_SPLITS = 3  # Số fold TimeSeriesSplit khi tìm siêu tham số bên trong một fold
+FOLD_CACHE_DIR = 'data//folds'
+# Tăng khi cách dựng ma trận fold thay đổi để bỏ qua cache cũ
+FOLD_CACHE_VERSION = 1
+
+
+def target_column(data):
+    return [col for col in data.columns if 'close' in col.lower()][0]
+
+
+# Khóa cache phụ thuộc nội dung dữ liệu và cấu hình chia fold
+def dataset_key(data, n_splits=WF_SPLITS, gap=WF_GAP):
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    digest.update(repr((list(data.columns), n_splits, gap, FOLD_CACHE_VERSION)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def build_folds(data, n_splits=WF_SPLITS, gap=WF_GAP):
+    """Chia dữ liệu theo thời gian thành các fold cửa sổ mở rộng.
+
+    Imputer (trung bình) và scaler được fit chỉ trên phần huấn luyện của từng fold rồi áp dụng
+    cho phần kiểm tra, nên không có thông tin tương lai nào lọt vào tập huấn luyện.
+    """
+    data = data.sort_index()
+    target = target_column(data)
+    X = data.drop(columns=[target])
+    y = data[target].to_numpy()
+
+    folds = []
+    for train_idx, test_idx in TimeSeriesSplit(n_splits=n_splits, gap=gap).split(X):
+        preprocess = Pipeline([('imputer', SimpleImputer(strategy='mean', keep_empty_features=True)),
+                               ('scaler', StandardScaler())])
+        folds.append({
+            'X_train': preprocess.fit_transform(X.iloc[train_idx]),
+            'X_test': preprocess.transform(X.iloc[test_idx]),
+            'y_train': y[train_idx],
+            'y_test': y[test_idx],
+            'train_start': X.index[train_idx[0]], 'train_end': X.index[train_idx[-1]],
+            'test_start': X.index[test_idx[0]], 'test_end': X.index[test_idx[-1]],
+        })
+    return folds
+
+
+# Ma trận của các fold được lưu trên đĩa để mọi mô hình (và các lần chạy sau) dùng lại;
+# mmap cho phép các tiến trình song song đọc chung mà không sao chép
+def load_folds(name, data, n_splits=WF_SPLITS, gap=WF_GAP, cache_dir=FOLD_CACHE_DIR):
+    path = os.path.join(cache_dir, f'{name}_{dataset_key(data, n_splits, gap)}.joblib')
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        joblib.dump(build_folds(data, n_splits, gap), path)
+    return joblib.load(path, mmap_mode='r')
+
+
+def evaluate(y_true, y_pred):
+    mse = mean_squared_error(y_true, y_pred)
+    return {
+        'RMSE': np.sqrt(mse),
+        'MAE': mean_absolute_error(y_true, y_pred),
+        'MSE': mse,
+        'R^2': r2_score(y_true, y_pred)
+    }
+
+
+# Trung bình các chỉ số trên mọi fold cho từng cặp (dataset, mô hình)
+def summarize(fold_results):
+    metrics = ['RMSE', 'MAE', 'MSE', 'R^2']
+    summary = fold_results.groupby(['Dataset', 'Model'], sort=False)[metrics].mean().reset_index()
+    summary['Folds'] = fold_results.groupby(['Dataset', 'Model'], sort=False).size().to_numpy()
+    return summary.rename(columns={metric: f'WF_{metric}' for metric in metrics})